@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Spike and flat-zone report for a recording, written next to its plot as <stem>.json.
+# The report records the content hash of the file it describes, so re-analysing an
+# unchanged file only costs hashing it.
+REPORT_VERSION = 1
+SPIKE_THRESHOLD = 3.5  # robust z-score, the usual cut-off for the modified z-score
+MIN_FLAT_RUN = 3  # identical consecutive samples that count as a flat zone
+MAX_LISTED = 100  # positions listed per channel, the counts cover all of them
+
+
+def content_hash(file_path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def robust_z(values):
+    """Modified z-score of every sample against its channel's median and MAD, channels in columns."""
+    median = np.median(values, axis=0)
+    deviation = np.abs(values - median)
+    mad = np.median(deviation, axis=0)
+    mad[mad == 0] = np.inf  # a constant channel has no spikes
+    return 0.6745 * deviation / mad
+
+
+def runs(mask_or_values, min_length=1, equal=False):
+    """Run-length encode the columns of a 2-D array at once.
+
+    With equal=True runs are stretches of identical values, otherwise stretches of True.
+    Returns (channel, start, length) arrays of the runs at least `min_length` long.
+    """
+    x = mask_or_values.T
+    n = x.shape[1]
+    starts = np.ones(x.shape, dtype=bool)
+    starts[:, 1:] = x[:, 1:] != x[:, :-1]
+    flat_starts = np.flatnonzero(starts)
+    lengths = np.diff(np.append(flat_starts, x.size))
+    channel, start = np.divmod(flat_starts, n)
+    keep = lengths >= min_length
+    if not equal:
+        keep &= x.ravel()[flat_starts]  # only the runs of True
+    return channel[keep], start[keep], lengths[keep]
+
+
+def analyze(values, times, channels, spike_threshold=SPIKE_THRESHOLD, min_flat_run=MIN_FLAT_RUN):
+    """Spike and flat-run summary per channel of `values` (samples x channels)."""
+    times = np.asarray(times, dtype=np.float64) - times[0]
+    values = np.asarray(values, dtype=np.float32)
+    spikes = robust_z(values) > spike_threshold
+    spike_channel, spike_start, spike_length = runs(spikes)
+    flat_channel, flat_start, flat_length = runs(values, min_flat_run, equal=True)
+    period = float(np.median(np.diff(times))) if len(times) > 1 else 0.0
+
+    report = {}
+    for i, name in enumerate(channels):
+        in_spikes = spike_channel == i
+        starts, lengths = spike_start[in_spikes], spike_length[in_spikes]
+        # Peak of each spike event, from the sample with the largest deviation within it
+        peaks = [float(values[s:s + n, i][np.argmax(np.abs(values[s:s + n, i]))])
+                 for s, n in zip(starts[:MAX_LISTED], lengths[:MAX_LISTED])]
+        in_flat = flat_channel == i
+        flat_starts, flat_lengths = flat_start[in_flat], flat_length[in_flat]
+        longest = int(np.argmax(flat_lengths)) if len(flat_lengths) else None
+        report[name] = {
+            "spike_samples": int(spikes[:, i].sum()),
+            "spikes": int(len(starts)),
+            "spike_positions": [{"index": int(s), "time": round(float(times[s]), 4), "samples": int(n), "peak": p}
+                                for s, n, p in zip(starts[:MAX_LISTED], lengths[:MAX_LISTED], peaks)],
+            "flat_runs": int(len(flat_starts)),
+            "flat_samples": int(flat_lengths.sum()),
+            "flat_seconds": round(float(flat_lengths.sum()) * period, 4),
+            "longest_flat": None if longest is None else {
+                "index": int(flat_starts[longest]), "time": round(float(times[flat_starts[longest]]), 4),
+                "samples": int(flat_lengths[longest]), "seconds": round(float(flat_lengths[longest]) * period, 4)},
+            "flat_positions": [{"index": int(s), "time": round(float(times[s]), 4), "samples": int(n),
+                                "seconds": round(float(n) * period, 4)}
+                               for s, n in zip(flat_starts[:MAX_LISTED], flat_lengths[:MAX_LISTED])],
+        }
+    return report
+
+
+def write_report(file_path, recording, report_path, spike_threshold=SPIKE_THRESHOLD, min_flat_run=MIN_FLAT_RUN,
+                 digest=None):
+    """Analyse `recording` (read from `file_path`) into `report_path`, unless the report there
+    already describes the same content with the same settings. Returns the report.
+    `digest` is the file's content_hash() if the caller already has it."""
+    digest = digest or content_hash(file_path)
+    settings = {"spike_threshold": spike_threshold, "min_flat_run": min_flat_run}
+    try:
+        with open(report_path) as f:
+            cached = json.load(f)
+        if cached.get("version") == REPORT_VERSION and cached.get("hash") == digest and cached.get("settings") == settings:
+            return cached
+    except (FileNotFoundError, ValueError):
+        pass
+
+    report = {
+        "version": REPORT_VERSION,
+        "file": os.path.basename(file_path),
+        "hash": digest,
+        "settings": settings,
+        "samples": len(recording),
+        "channels": analyze(recording.values(), recording['Epoch Time'], recording.channels,
+                            spike_threshold, min_flat_run),
+    }
+    tmp = report_path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(report, f, indent=1)
+    os.replace(tmp, report_path)
+    return report
@@ -0,0 +1,211 @@
+import argparse
+import bisect
+import itertools
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from flask import Flask
+
+from live_routes import init_live
+
+# Benchmark of the live receiver (init_live, the same routes app.py and realtime_stream.py serve).
+# Every case writes synthetic sinewave_bench<i>.txt streams into a temp folder, appends to them
+# at a fixed rate and has polling clients hit /data/<stream> through Flask's test client. Each
+# case runs in a fresh process so background readers from earlier cases can't skew it, and
+# prints one JSON line of results.
+
+
+def percentiles(values, scale=1000):
+    if not values:
+        return {}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99]) * scale
+    return {"p50": round(p50, 3), "p90": round(p90, 3), "p99": round(p99, 3),
+            "max": round(max(values) * scale, 3)}
+
+
+def write_samples(f, count, start=0):
+    t = np.arange(start, start + count)
+    f.write("".join(f"{val:.5f}\n" for val in np.sin(2 * np.pi * t / 100)))
+    f.flush()
+
+
+class Appender:
+    """Appends to every stream at `rate` samples per second, logging when each batch hit the file."""
+
+    def __init__(self, paths, initial, rate, batch_ms=10):
+        self.paths = paths
+        self.rate = rate
+        self.batch_ms = batch_ms
+        self.counts = {path: [initial] for path in paths}  # samples in the file after each write
+        self.times = {path: [0.0] for path in paths}  # perf_counter of each write
+        self.stop = threading.Event()
+
+    def written_at(self, path, index):
+        """When sample `index` of `path` was written, None for samples that predate the run."""
+        i = bisect.bisect_right(self.counts[path], index)
+        return self.times[path][i] if 0 < i < len(self.times[path]) else None
+
+    def run(self):
+        files = {path: open(path, "a") for path in self.paths}
+        start = time.perf_counter()
+        written = 0
+        try:
+            while not self.stop.is_set():
+                due = int((time.perf_counter() - start) * self.rate)
+                if due > written:
+                    for path, f in files.items():
+                        write_samples(f, due - written, self.counts[path][-1])
+                        self.counts[path].append(self.counts[path][-1] + due - written)
+                        self.times[path].append(time.perf_counter())
+                    written = due
+                self.stop.wait(self.batch_ms / 1000)
+        finally:
+            for f in files.values():
+                f.close()
+
+
+def client(app, stream, appender, path, deadline, poll_ms, binary, results):
+    test_client = app.test_client()
+    headers = {"Accept": "application/octet-stream"} if binary else {}
+    cursor = None
+    while time.perf_counter() < deadline:
+        query = "window=1000" if cursor is None else f"since={cursor}&window=1000"
+        cpu = time.thread_time()
+        start = time.perf_counter()
+        response = test_client.get(f"/data/{stream}?{query}", headers=headers)
+        body = response.get_data()
+        done = time.perf_counter()
+        results["cpu"].append(time.thread_time() - cpu)
+        results["latency"].append(done - start)
+        results["bytes"].append(len(body))
+        if response.status_code != 200:
+            results["errors"] += 1
+        else:
+            if binary:
+                new_cursor = int.from_bytes(body[16:24], "little")
+            else:
+                new_cursor = response.get_json()["cursor"]
+            if cursor is not None and new_cursor > cursor:
+                # Age of the oldest sample this response delivered for the first time
+                written = appender.written_at(path, cursor)
+                if written is not None:
+                    results["staleness"].append(done - written)
+                results["samples"] += new_cursor - cursor
+            cursor = new_cursor
+        time.sleep(max(0, poll_ms / 1000 - (done - start)))
+
+
+def run_case(case):
+    """Run one benchmark configuration and return its results as a dict."""
+    folder = tempfile.mkdtemp(prefix="bench_receiver_")
+    try:
+        paths = []
+        for i in range(case["streams"]):
+            path = os.path.join(folder, f"sinewave_bench{i}.txt")
+            with open(path, "w") as f:
+                write_samples(f, case["length"])
+            paths.append(path)
+
+        app = Flask(__name__)
+        load_start = time.perf_counter()
+        _, tailer = init_live(app, folder, ring_capacity=case["ring"])
+        # Wait for the background reader to load the existing samples
+        while any(tailer.count(path) < case["length"] for path in paths):
+            time.sleep(0.01)
+        initial_load = time.perf_counter() - load_start
+
+        appender = Appender(paths, case["length"], case["rate"])
+        writer = threading.Thread(target=appender.run, daemon=True)
+        writer.start()
+
+        per_client = [{"latency": [], "bytes": [], "cpu": [], "staleness": [], "samples": 0, "errors": 0}
+                      for _ in range(case["clients"])]
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        deadline = time.perf_counter() + case["duration"]
+        clients = [threading.Thread(target=client, args=(app, f"sinewave_bench{i % len(paths)}", appender,
+                                                         paths[i % len(paths)], deadline, case["poll_ms"],
+                                                         case["binary"], per_client[i]))
+                   for i in range(case["clients"])]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        after = resource.getrusage(resource.RUSAGE_SELF)
+        appender.stop.set()
+        writer.join()
+
+        results = {key: [value for r in per_client for value in r[key]]
+                   for key in ("latency", "bytes", "cpu", "staleness")}
+        results["samples"] = sum(r["samples"] for r in per_client)
+        results["errors"] = sum(r["errors"] for r in per_client)
+
+        requests = len(results["latency"])
+        process_cpu = (after.ru_utime - usage.ru_utime) + (after.ru_stime - usage.ru_stime)
+        return {
+            "case": case,
+            "initial_load_s": round(initial_load, 3),
+            "requests": requests,
+            "errors": results["errors"],
+            "requests_per_s": round(requests / case["duration"], 1),
+            "latency_ms": percentiles(results["latency"]),
+            "bytes_per_response": round(float(np.mean(results["bytes"])), 1) if requests else 0,
+            "cpu_ms_per_request": round(float(np.mean(results["cpu"])) * 1000, 3) if requests else 0,
+            "process_cpu_s": round(process_cpu, 3),  # includes the appender and background reader
+            "samples_served": results["samples"],
+            "write_to_response_ms": percentiles(results["staleness"]),
+        }
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def int_list(text):
+    return [int(value) for value in text.split(",")]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep the live receiver over file length, append rate, "
+                                                 "streams and clients and print one JSON line per case.")
+    parser.add_argument("--lengths", type=int_list, default=[1_000, 100_000], help="samples already in each file")
+    parser.add_argument("--rates", type=int_list, default=[30, 1000], help="samples per second appended per stream")
+    parser.add_argument("--streams", type=int_list, default=[1, 10], help="number of stream files")
+    parser.add_argument("--clients", type=int_list, default=[1, 8], help="concurrent polling clients")
+    parser.add_argument("--duration", type=float, default=5, help="seconds per case")
+    parser.add_argument("--poll-ms", type=float, default=100, help="delay between a client's requests")
+    parser.add_argument("--ring", type=int, default=200_000, help="ring buffer capacity per stream")
+    parser.add_argument("--binary", action="store_true", help="request the binary batch instead of JSON")
+    parser.add_argument("--output", help="append the JSON lines to this file as well")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    cases = [{"length": length, "rate": rate, "streams": streams, "clients": clients,
+              "duration": args.duration, "poll_ms": args.poll_ms, "ring": args.ring, "binary": args.binary}
+             for length, rate, streams, clients in itertools.product(args.lengths, args.rates,
+                                                                     args.streams, args.clients)]
+    out = open(args.output, "a") if args.output else None
+    try:
+        for i, case in enumerate(cases, 1):
+            print(f"[{i}/{len(cases)}] {case}", file=sys.stderr)
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                result = pool.submit(run_case, case).result()
+            line = json.dumps(result)
+            print(line)
+            if out:
+                out.write(line + "\n")
+                out.flush()
+    finally:
+        if out:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import mmap
+import os
+import struct
+
+import numpy as np
+
+# Append-only stream file written by realtime_signal_gen.py --format binary, little-endian:
+#   magic "SWB1" | version (uint16) | header size (uint16) | channels (uint16) | dtype ('f' or 'd') | pad
+#   sample rate (float64) | zero padding up to the header size
+# followed by fixed-size records of `channels` samples each.
+MAGIC = b"SWB1"
+HEADER = struct.Struct("<4sHHHcxd")
+HEADER_SIZE = 32
+DTYPES = {b"f": np.dtype("<f4"), b"d": np.dtype("<f8")}
+
+
+def read_header(f):
+    """Return (sample_rate, channels, dtype, header_size) from an open binary stream file."""
+    raw = f.read(HEADER.size)
+    if len(raw) < HEADER.size:
+        raise EOFError("Incomplete header")
+    magic, version, header_size, channels, dtype, sample_rate = HEADER.unpack(raw)
+    if magic != MAGIC or version != 1:
+        raise ValueError("Not a binary stream file")
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown sample type {dtype!r}")
+    if channels < 1:
+        raise ValueError("Binary stream file has no channels")
+    if header_size < HEADER.size:
+        raise ValueError(f"Header size {header_size} is smaller than the header")
+    return sample_rate, channels, DTYPES[dtype], header_size
+
+
+class BinaryStream:
+    """Zero-copy reader over a growing binary stream file via mmap and numpy.frombuffer."""
+
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "rb")
+        try:
+            self.sample_rate, self.channels, self.dtype, self.header_size = read_header(self.f)
+        except (EOFError, ValueError):
+            self.f.close()
+            raise
+        self.record_size = self.channels * self.dtype.itemsize
+        self._mm = None
+        self._records = 0
+        self.refresh()
+
+    def refresh(self):
+        """Map any records appended since the last call, returns the record count."""
+        size = os.fstat(self.f.fileno()).st_size
+        records = max(0, (size - self.header_size) // self.record_size)
+        if records != self._records:
+            # Views handed out earlier keep the old map alive until they are dropped
+            self._mm = mmap.mmap(self.f.fileno(), self.header_size + records * self.record_size,
+                                 access=mmap.ACCESS_READ)
+            self._records = records
+        return records
+
+    def __len__(self):
+        return self._records
+
+    def samples(self, start, stop=None, channel=0):
+        """View of one channel for records [start, stop), an O(1) seek into the map."""
+        stop = self._records if stop is None else min(stop, self._records)
+        start = min(max(start, 0), stop)
+        if stop == start:
+            return np.empty(0, dtype=self.dtype)
+        records = np.frombuffer(self._mm, dtype=self.dtype, count=(stop - start) * self.channels,
+                                offset=self.header_size + start * self.record_size)
+        return records.reshape(-1, self.channels)[:, channel]
+
+    def close(self):
+        self._mm = None
+        self.f.close()
@@ -0,0 +1,48 @@
+import numpy as np
+
+
+def minmax_indices(values, points):
+    """Indices of the min and max sample of each of points/2 buckets, in sample order."""
+    n = len(values)
+    buckets = max(points // 2, 1)
+    if n <= points:
+        return np.arange(n)
+    size = -(-n // buckets)
+    # Pad the last bucket with its final sample so every bucket has the same width
+    padded = np.pad(values, (0, size * buckets - n), mode="edge").reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    imin = np.minimum(offsets + padded.argmin(axis=1), n - 1)
+    imax = np.minimum(offsets + padded.argmax(axis=1), n - 1)
+    pairs = np.stack([np.minimum(imin, imax), np.maximum(imin, imax)], axis=1).ravel()
+    return np.unique(pairs)
+
+
+def lttb_indices(values, points):
+    """Largest-Triangle-Three-Buckets selection, keeps the first and last sample."""
+    n = len(values)
+    if n <= points or points < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = values[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (values[lo:hi] - values[a]) - (x[a] - x[lo:hi]) * (avg_y - values[a]))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+METHODS = {"minmax": minmax_indices, "lttb": lttb_indices}
+
+
+def decimate(start, values, points, method="minmax"):
+    """Reduce `values` (starting at sample index `start`) to about `points` samples, returns (x, y)."""
+    values = np.asarray(values, dtype=np.float64)
+    idx = METHODS[method](values, points)
+    return (idx + start).tolist(), values[idx].tolist()
@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+
+from inotify_watch import DirectoryWatch, IN_DELETE, IN_MOVED_FROM, IN_Q_OVERFLOW
+from metrics import STAGE_SECONDS
+
+
+class FileIndex:
+    """Keep a folder's sample files in memory ordered by mtime so requests never scan the share.
+
+    A background thread applies inotify events where available; otherwise, and every
+    `resync_interval` seconds as a safety net, it sweeps the folder with os.scandir.
+    """
+
+    def __init__(self, folder, suffixes=(".txt",), sweep_interval=1.0, resync_interval=10.0, use_inotify=True):
+        self.folder = folder
+        self.suffixes = suffixes
+        self.sweep_interval = sweep_interval
+        self.resync_interval = resync_interval
+        self.use_inotify = use_inotify
+        self._lock = threading.Lock()
+        self._mtimes = {}  # path -> mtime
+        self._ordered = []  # paths, newest first
+        self._thread = None
+
+    def _publish(self):
+        # Called with the lock held, re-sorts only when something changed
+        self._ordered = sorted(self._mtimes, key=self._mtimes.get, reverse=True)
+
+    def sweep(self):
+        mtimes = {}
+        try:
+            with STAGE_SECONDS.time(stage="scan"), os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.name.endswith(self.suffixes) and entry.is_file():
+                        mtimes[entry.path] = entry.stat().st_mtime
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            if mtimes != self._mtimes:
+                self._mtimes = mtimes
+                self._publish()
+
+    def _apply(self, mask, name):
+        if not name.endswith(self.suffixes):
+            return
+        path = os.path.join(self.folder, name)
+        try:
+            mtime = None if mask & (IN_DELETE | IN_MOVED_FROM) else os.stat(path).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if mtime is None:
+                if self._mtimes.pop(path, None) is not None:
+                    self._publish()
+            elif self._mtimes.get(path) != mtime:
+                newest = self._ordered[0] if self._ordered else None
+                self._mtimes[path] = mtime
+                # The common case is the newest file being appended to again
+                if path != newest or len(self._ordered) != len(self._mtimes):
+                    self._publish()
+
+    def _run(self):
+        watch = None
+        if self.use_inotify:
+            try:
+                watch = DirectoryWatch(self.folder)
+            except OSError as e:
+                print(f"inotify unavailable for {self.folder} ({e}), sweeping every {self.sweep_interval}s")
+
+        last_sweep = time.monotonic()
+        while True:
+            try:
+                if watch is not None:
+                    for mask, name in watch.read_events(timeout=self.resync_interval):
+                        if mask & IN_Q_OVERFLOW:
+                            last_sweep = 0
+                        else:
+                            self._apply(mask, name)
+                    interval = self.resync_interval
+                else:
+                    time.sleep(self.sweep_interval)
+                    interval = self.sweep_interval
+                if time.monotonic() - last_sweep >= interval:
+                    self.sweep()
+                    last_sweep = time.monotonic()
+            except Exception as e:
+                print(f"Error indexing {self.folder}: {e}")
+                time.sleep(self.sweep_interval)
+
+    def start(self):
+        """Populate the index once and keep it current from a daemon thread."""
+        if self._thread is None:
+            self.sweep()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def active(self, max_age):
+        """Paths modified in the last `max_age` seconds, newest first. The newest file is always included."""
+        cutoff = time.time() - max_age
+        with self._lock:
+            paths = [path for path in self._ordered if self._mtimes[path] >= cutoff]
+            return paths or self._ordered[:1]
+
+    def files(self):
+        """Return (path, mtime) pairs, newest first."""
+        with self._lock:
+            return [(path, self._mtimes[path]) for path in self._ordered]
@@ -0,0 +1,206 @@
+from flask import Blueprint, current_app, jsonify, render_template_string, request
+import os
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+from recording_cache import read_cache
+
+# Archived sessions written by stream_v2.py, served from the min/max pyramid in their sidecars
+history = Blueprint("history", __name__)
+
+HISTORY_PAGE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Archived Sessions</title>
+    <script src="/static/plotly.min.js"></script>
+</head>
+<body>
+    <h2>Archived Sessions</h2>
+    <select id="session"></select>
+    <p id="level"></p>
+    <div id="plot" style="width:90vw; height:80vh;"></div>
+
+    <script>
+    window.onload = function() {
+        const plot = document.getElementById('plot');
+        const select = document.getElementById('session');
+        const listed = {};  // session -> its entry in /history/sessions
+        let session = null;
+        let origin = 0;  // epoch time of the session's first sample, x is seconds from there
+        let pending = null;
+
+        // Buckets become vertical min-max segments, the same envelope the printed plots use
+        function traces(result) {
+            return result.channels.map((channel, i) => {
+                const x = [], y = [];
+                for (let j = 0; j < channel.t.length; j++) {
+                    x.push(channel.t[j] - origin, channel.t[j] - origin);
+                    y.push(channel.min[j], channel.max[j]);
+                }
+                return { x: x, y: y, mode: 'lines', name: channel.name,
+                         xaxis: 'x', yaxis: i ? 'y' + (i + 1) : 'y' };
+            });
+        }
+
+        async function load(range) {
+            const params = new URLSearchParams({ points: 2 * plot.clientWidth });
+            if (range) {
+                params.set('start', origin + range[0]);
+                params.set('end', origin + range[1]);
+            }
+            const response = await fetch(`/history/${encodeURIComponent(session)}/data?` + params);
+            const result = await response.json();
+            document.getElementById('level').textContent = `${result.samples} samples, level 1:${result.level}`;
+            const layout = plot.layout || {};
+            layout.grid = { rows: result.channels.length, columns: 1, pattern: 'coupled' };
+            layout.showlegend = true;
+            layout.margin = { t: 20 };
+            layout.xaxis = Object.assign(layout.xaxis || {}, { title: 'Seconds' });
+            if (range) {
+                layout.xaxis.range = range;
+                layout.xaxis.autorange = false;
+            } else {
+                layout.xaxis.autorange = true;
+            }
+            Plotly.react(plot, traces(result), layout);
+        }
+
+        async function open(name) {
+            session = name;
+            origin = listed[name].start;
+            Plotly.purge(plot);
+            await load(null);
+            plot.on('plotly_relayout', event => {
+                // Refetch the visible range at screen resolution once zooming settles
+                clearTimeout(pending);
+                if (event['xaxis.autorange']) {
+                    pending = setTimeout(() => load(null), 100);
+                } else if ('xaxis.range[0]' in event) {
+                    const range = [event['xaxis.range[0]'], event['xaxis.range[1]']];
+                    pending = setTimeout(() => load(range), 100);
+                }
+            });
+        }
+
+        fetch('/history/sessions').then(r => r.json()).then(result => {
+            for (const s of result.sessions) {
+                listed[s.session] = s;
+                const option = document.createElement('option');
+                option.value = option.textContent = s.session;
+                select.appendChild(option);
+            }
+            select.onchange = () => open(select.value);
+            if (result.sessions.length) {
+                open(result.sessions[0].session);
+            }
+        });
+    };
+    </script>
+</body>
+</html>
+"""
+
+
+def init_history(app, folder, max_open=32):
+    """Serve the sidecars in `folder` (stream_v2.py's saved data directory) under /history.
+
+    At most `max_open` sessions are kept memory-mapped, the least recently viewed is closed first.
+    """
+    app.extensions["history"] = {"folder": folder, "sessions": OrderedDict(), "max_open": max_open,
+                                 "lock": threading.Lock()}
+    app.register_blueprint(history)
+
+
+def _sessions():
+    """Return {session: (sidecar dir, meta)} for every readable sidecar, newest first."""
+    folder = current_app.extensions["history"]["folder"]
+    found = []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if not (entry.name.endswith(".cache") and entry.is_dir()):
+                    continue
+                try:
+                    meta_path = os.path.join(entry.path, "meta.json")
+                    mtime = os.stat(meta_path).st_mtime
+                    with open(meta_path) as f:
+                        found.append((mtime, entry.name[:-len(".cache")], entry.path, json.load(f)))
+                except (OSError, ValueError):
+                    pass
+    except FileNotFoundError:
+        pass
+    found.sort(reverse=True)
+    return {name: (path, meta) for _, name, path, meta in found}
+
+
+def _recording(session):
+    """Open (and keep open) the memory-mapped sidecar of `session`, None if there isn't a current one."""
+    state = current_app.extensions["history"]
+    path = os.path.join(state["folder"], f"{session}.cache")
+    try:
+        mtime = os.stat(os.path.join(path, "meta.json")).st_mtime
+    except OSError:
+        return None
+    with state["lock"]:
+        cached = state["sessions"].get(session)
+        if cached is None or cached[0] != mtime:
+            recording = read_cache(path)
+            if recording is None:
+                return None
+            cached = state["sessions"][session] = (mtime, recording)
+        state["sessions"].move_to_end(session)
+        while len(state["sessions"]) > state["max_open"]:
+            state["sessions"].popitem(last=False)
+        return cached[1]
+
+
+@history.route("/history")
+def history_page():
+    return render_template_string(HISTORY_PAGE)
+
+
+@history.route("/history/sessions")
+def sessions():
+    # Built from meta.json alone, without opening any session's arrays
+    listing = []
+    for session, (path, meta) in _sessions().items():
+        if not meta.get("rows"):
+            continue
+        start, end = meta.get("start"), meta.get("end")
+        if start is None:
+            # Written before meta.json carried the time range
+            try:
+                epoch = np.load(os.path.join(path, "epoch.npy"), mmap_mode="r")
+                start, end = float(epoch[0]), float(epoch[-1])
+                del epoch
+            except (OSError, ValueError, IndexError):
+                continue
+        listing.append({"session": session, "source": meta["source"], "samples": meta["rows"],
+                        "channels": meta["channels"], "levels": sorted(meta.get("pyramid", [])),
+                        "start": start, "end": end})
+    return jsonify({"sessions": listing})
+
+
+@history.route("/history/<session>/data")
+def session_data(session):
+    # ?start=&end= in epoch seconds (default the whole session), ?points= the screen budget per channel,
+    # ?channel= one channel instead of all of them
+    recording = _recording(session)
+    if recording is None:
+        return jsonify({"error": f"Unknown session {session}"}), 404
+    start = request.args.get("start", type=float)
+    end = request.args.get("end", type=float)
+    points = max(request.args.get("points", default=2000, type=int), 2)
+    names = request.args.getlist("channel") or recording.channels
+    unknown = [name for name in names if name not in recording.arrays]
+    if unknown:
+        return jsonify({"error": f"Unknown channel {unknown[0]}"}), 404
+
+    channels = []
+    level = 1
+    for name in names:
+        level, t, lo, hi = recording.envelope(name, start, end, points)
+        channels.append({"name": name, "t": t.tolist(), "min": lo.tolist(), "max": hi.tolist()})
+    return jsonify({"session": session, "samples": len(recording), "level": level, "channels": channels})
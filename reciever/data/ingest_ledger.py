@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Every file stream_v2.py has taken on, by name, with the size and mtime it had when it was
+# picked up, its content hash and the last stage it completed:
+#   queued    handed to the render pool
+#   rendered  plot (and report) written
+#   printing  plot handed to the print queue, print_status tells what became of it:
+#             queued, sent, failed (retries exhausted) or dropped (queue full)
+#   moved     archived into 'saved data', done
+#   failed    a render worker kept dying on it, left where it is
+# After a crash or restart the monitor carries on from these instead of starting over.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT,
+    stage TEXT NOT NULL,
+    plot TEXT,
+    print_status TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_plot ON files (plot);
+CREATE INDEX IF NOT EXISTS files_print_status ON files (print_status);
+"""
+
+
+class IngestLedger:
+    """SQLite record of the files the monitor has taken on and how far each one got.
+
+    Every change is committed before the call returns, so a stage recorded before a step
+    survives a crash during it. Shared by the monitor and the print worker thread.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def get(self, name):
+        with self._lock:
+            row = self.db.execute("SELECT * FROM files WHERE name = ?", (name,)).fetchone()
+        return None if row is None else dict(row)
+
+    def entry(self, file_path):
+        """The row of `file_path` if it still describes that file (same size and mtime), else None."""
+        row = self.get(os.path.basename(file_path))
+        if row is None:
+            return None
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        if (row["size"], row["mtime_ns"]) != (st.st_size, st.st_mtime_ns):
+            return None  # a new upload under an old name
+        return row
+
+    def start(self, file_path):
+        """Record `file_path` as queued, replacing whatever was known about an earlier file of that name."""
+        st = os.stat(file_path)
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO files (name, size, mtime_ns, stage, updated) "
+                            "VALUES (?, ?, ?, 'queued', ?)",
+                            (os.path.basename(file_path), st.st_size, st.st_mtime_ns, time.time()))
+
+    def advance(self, name, stage=None, **fields):
+        """Move `name` on to `stage` and/or set its hash, plot or print_status."""
+        if stage is not None:
+            fields["stage"] = stage
+        fields["updated"] = time.time()
+        columns = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self.db.execute(f"UPDATE files SET {columns} WHERE name = ?", (*fields.values(), name))
+
+    def print_done(self, plot_paths, ok):
+        """Print queue callback: the job holding `plot_paths` was sent, or given up on."""
+        with self._lock:
+            self.db.executemany("UPDATE files SET print_status = ?, updated = ? WHERE plot = ? AND print_status = 'queued'",
+                                [("sent" if ok else "failed", time.time(), path) for path in plot_paths])
+
+    def unprinted(self):
+        """(name, plot) of every plot handed to the print queue that never went out."""
+        with self._lock:
+            return [tuple(row) for row in
+                    self.db.execute("SELECT name, plot FROM files WHERE print_status = 'queued' ORDER BY updated")]
+
+    def close(self):
+        with self._lock:
+            self.db.close()
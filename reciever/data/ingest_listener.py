@@ -0,0 +1,130 @@
+import os
+import socket
+import socketserver
+import struct
+import threading
+
+from wire_format import decode_batch
+
+# Samples pushed by realtime_signal_gen.py --send, bypassing the share. Every batch is a wire
+# format frame (see wire_format.py) whose filename names the stream, whose start is the
+# sender's index of its first sample and whose cursor identifies the sender's run. Over TCP
+# each frame is preceded by its length (uint32, little-endian); over UDP every datagram is
+# one frame.
+FRAME_LENGTH = struct.Struct("<I")
+MAX_FRAME = 16 << 20
+
+
+class TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class UDPServer(socketserver.UDPServer):
+    max_packet_size = 65535  # the stock 8192 would truncate batches of more than ~2000 samples
+
+
+def recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError
+        data += chunk
+    return bytes(data)
+
+
+class IngestListener:
+    """Feeds framed batches from TCP and/or UDP into the tailer's ring buffers, as if
+    they had been read from `folder`. With `persist`, the samples are also appended to
+    the stream's text file there."""
+
+    def __init__(self, tailer, folder, host="0.0.0.0", port=5200, tcp=True, udp=True, persist=False):
+        self.tailer = tailer
+        self.folder = folder
+        self.host = host
+        self.port = port
+        self.tcp = tcp
+        self.udp = udp
+        self.persist = persist
+        self._files = {}  # path -> open file, when persisting
+        self._persist_lock = threading.Lock()
+        self.servers = []
+        self._connections = set()
+
+    def handle(self, payload, sender):
+        try:
+            filename, start, session, values = decode_batch(payload)
+        except (ValueError, struct.error) as e:
+            print(f"Ignoring bad frame from {sender}: {e}")
+            return
+        name = os.path.basename(filename)
+        if not name.endswith(".txt"):
+            name += ".txt"
+        path = os.path.join(self.folder, name)
+        values = self.tailer.push(path, values, start, session)
+        if self.persist and len(values):
+            with self._persist_lock:
+                f = self._files.get(path)
+                if f is None:
+                    f = self._files[path] = open(path, "a")
+                f.write("".join(f"{val:.5f}\n" for val in values))
+                f.flush()
+
+    def start(self):
+        listener = self
+
+        class TCPHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                sender = self.client_address[0]
+                print(f"Sender connected: {sender}")
+                listener._connections.add(self.request)
+                try:
+                    while True:
+                        (size,) = FRAME_LENGTH.unpack(recv_exactly(self.request, FRAME_LENGTH.size))
+                        if size > MAX_FRAME:
+                            print(f"Frame of {size} bytes from {sender}, closing")
+                            return
+                        listener.handle(recv_exactly(self.request, size), sender)
+                except (EOFError, OSError):
+                    pass  # a partial frame is dropped, the sender resends it after reconnecting
+                finally:
+                    listener._connections.discard(self.request)
+                print(f"Sender disconnected: {sender}")
+
+        class UDPHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                listener.handle(self.request[0], self.client_address[0])
+
+        # A port that is taken only costs push ingest, the dashboard keeps serving the share
+        protocols = []
+        for name, on, server_class, handler in (("TCP", self.tcp, TCPServer, TCPHandler),
+                                                ("UDP", self.udp, UDPServer, UDPHandler)):
+            if not on:
+                continue
+            try:
+                server = server_class((self.host, self.port), handler)
+            except OSError as e:
+                print(f"Not listening for pushed samples on {name} port {self.port}: {e}")
+                continue
+            self.servers.append(server)
+            protocols.append(name)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        if protocols:
+            print(f"Listening for pushed samples on {'/'.join(protocols)} port {self.port}")
+        return self
+
+    def close(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.servers = []
+        for conn in list(self._connections):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        with self._persist_lock:
+            for f in self._files.values():
+                f.close()
+            self._files = {}
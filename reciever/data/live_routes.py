@@ -0,0 +1,306 @@
+from flask import Blueprint, Response, current_app, jsonify, render_template_string, request
+import os
+import json
+import math
+import numpy as np
+from decimate import METHODS, decimate
+from file_index import FileIndex
+from metrics import SAMPLES_SERVED, STAGE_SECONDS, STREAM_CLIENTS
+from stream_store import StreamTailer
+from wire_format import DTYPES, MIMETYPE, encode_batch
+
+# Routes shared by app.py and realtime_stream.py, which only differ in the folder they watch
+live = Blueprint("live", __name__)
+
+# Samples each browser trace keeps before extendTraces drops the oldest (?keep=N on a page
+# overrides it), and the count past which a trace is drawn with WebGL (scattergl)
+TRACE_POINTS = 20_000
+WEBGL_POINTS = 5_000
+
+MULTI_PAGE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Live Sinewave Plots - All Active Streams</title>
+    <script src="/static/plotly.min.js"></script>
+    <script src="/static/dashboard.js"></script>
+</head>
+<body>
+    <h2>Live Sinewave Plots (All Active Streams)</h2>
+    <div id="plots" style="display:grid; grid-template-columns:repeat(auto-fill, minmax(500px, 1fr)); gap:10px;"></div>
+
+    <script>
+    window.onload = function() {
+        const maxPoints = 1000;  // samples in view
+        const params = new URLSearchParams(window.location.search);
+        const keepPoints = parseInt(params.get('keep')) || {{ trace_points }};
+        const glPoints = {{ webgl_points }};
+        const streams = {};  // stream id -> { lastIndex, generation, div, stats, cell, trace }
+
+        function emptyPlot(div, id, type) {
+            Plotly.react(div, [{ x: [], y: [], type: type, mode: 'lines', name: id }], {
+                title: id,
+                margin: { t: 40 },
+                xaxis: { title: 'Sample Index' },
+                yaxis: { title: 'Amplitude' }
+            });
+        }
+
+        async function refreshStreams() {
+            try {
+                const response = await fetch('/streams');
+                const result = await response.json();
+                const active = new Set(result.streams.map(s => s.id));
+                for (const id of active) {
+                    if (!(id in streams)) {
+                        const cell = document.createElement('div');
+                        const div = document.createElement('div');
+                        div.style.height = '40vh';
+                        const stats = document.createElement('div');
+                        cell.appendChild(div);
+                        cell.appendChild(stats);
+                        document.getElementById('plots').appendChild(cell);
+                        emptyPlot(div, id, 'scatter');
+                        streams[id] = { lastIndex: 0, generation: 0, div: div, stats: stats, cell: cell,
+                                        trace: newTrace() };
+                    }
+                }
+                for (const id of Object.keys(streams)) {
+                    if (!active.has(id)) {
+                        Plotly.purge(streams[id].div);
+                        streams[id].cell.remove();
+                        delete streams[id];
+                    }
+                }
+            } catch (error) {
+                console.error("Error fetching streams:", error);
+            }
+        }
+
+        // Batches of every stream that arrived since the last frame are drawn together
+        function drawPending() {
+            for (const stream of Object.values(streams)) {
+                drawBatches(stream.div, stream.trace, keepPoints, glPoints, maxPoints);
+            }
+        }
+
+        async function updateStream(id) {
+            const stream = streams[id];
+            try {
+                const query = `since=${stream.lastIndex}&generation=${stream.generation}&window=${maxPoints}`;
+                const data = await fetchBatch(`/data/${encodeURIComponent(id)}?` + query);
+                if (data === null) {
+                    return;
+                }
+                if (data.generation !== stream.generation || data.start < stream.lastIndex) {
+                    // file was truncated or replaced
+                    stream.trace = newTrace();
+                    emptyPlot(stream.div, id, stream.trace.traceType);
+                }
+                if (data.values.length > 0) {
+                    queueBatch(stream.trace, data, keepPoints);
+                    requestDraw(drawPending);
+                }
+                stream.lastIndex = data.cursor;
+                stream.generation = data.generation;
+            } catch (error) {
+                console.error(`Error fetching ${id}:`, error);
+            }
+        }
+
+        async function updateStats(id) {
+            try {
+                const response = await fetch(`/stats/${encodeURIComponent(id)}`);
+                if (response.ok && id in streams) {
+                    streams[id].stats.textContent = formatStats(await response.json());
+                }
+            } catch (error) {
+                console.error(`Error fetching stats for ${id}:`, error);
+            }
+        }
+
+        refreshStreams();
+        setInterval(refreshStreams, 2000);
+        setInterval(() => Object.keys(streams).forEach(updateStream), 500);
+        setInterval(() => Object.keys(streams).forEach(updateStats), 1000);
+    };
+    </script>
+</body>
+</html>
+"""
+
+
+def init_live(app, folder, ring_capacity=200_000, active_seconds=60, sample_rate=30):
+    """Index `folder`, start the shared reader and register the live routes on `app`.
+
+    Every file modified in the last `active_seconds` is tailed as its own stream.
+    `sample_rate` is assumed for text files, binary files carry their own.
+    """
+    file_index = FileIndex(folder, suffixes=(".txt", ".bin")).start()
+    tailer = StreamTailer(ring_capacity, sample_rate)
+    tailer.follow(lambda: file_index.active(active_seconds))
+    app.extensions["live"] = {"index": file_index, "tailer": tailer}
+    app.register_blueprint(live)
+    return file_index, tailer
+
+
+def _tailer():
+    return current_app.extensions["live"]["tailer"]
+
+
+def batch_response(file):
+    """Reply with the samples of `file` selected by the since/until/window/points query parameters."""
+    tailer = _tailer()
+    # ?since=<cursor>&file=<name>&generation=<n> only returns samples appended after the cursor,
+    # the generation (sent with every reply) changes when the file was replaced or truncated
+    since = request.args.get("since", default=0, type=int)
+    generation = request.args.get("generation", type=int)
+    # ?window=<samples> limits the reply to the tail, ?points=N decimates it to about N peak-preserving points
+    window = request.args.get("window", type=int)
+    until = request.args.get("until", type=int)  # with since, a range of sample indices
+    points = request.args.get("points", type=int)
+    if window is not None and window < 0:
+        return jsonify({"error": "window must not be negative"}), 400
+    if points is not None and points < 2:
+        return jsonify({"error": "points must be at least 2"}), 400
+    method = request.args.get("method", "minmax")
+    if method not in METHODS:
+        return jsonify({"error": f"method must be one of {sorted(METHODS)}"}), 400
+    # JSON stays the default, Accept: application/octet-stream gets the compact binary batch
+    binary = request.accept_mimetypes.best_match(["application/json", MIMETYPE]) == MIMETYPE
+    dtype = request.args.get("dtype", "f32")
+    if binary and dtype not in DTYPES:
+        return jsonify({"error": f"dtype must be one of {sorted(DTYPES)}"}), 400
+    start, cursor, generation_now = 0, 0, 0
+    if file:
+        filename = os.path.basename(file)
+        if request.args.get("file", filename) != filename:
+            since = 0  # client is still on the previous file, send the new one from the start
+        try:
+            start, values, cursor, generation_now = tailer.read(file, since, refresh=False, window=window,
+                                                                until=until, generation=generation)
+        except Exception as e:
+            print(f"Error reading file: {e}")
+            values = np.empty(0)
+            filename = "Error reading file"
+    else:
+        values = np.empty(0)
+        filename = "No stream files found"
+    x = None
+    if points is not None and len(values) > points:
+        # Decimated samples are no longer contiguous so they are sent as JSON with explicit x
+        x, values = decimate(start, values, points, method)
+    SAMPLES_SERVED.inc(len(values), route="data")
+
+    with STAGE_SECONDS.time(stage="encode"):
+        if x is not None:
+            return jsonify({"x": x, "values": values, "filename": filename, "start": start, "cursor": cursor,
+                            "generation": generation_now})
+        if binary:
+            # The wire format has no room for it, so the generation travels as a header
+            return Response(encode_batch(filename, start, cursor, values, dtype), mimetype=MIMETYPE,
+                            headers={"X-Stream-Generation": str(generation_now)})
+        return jsonify({"values": values.tolist(), "filename": filename, "start": start, "cursor": cursor,
+                        "generation": generation_now})
+
+
+@live.route("/data")
+def data():
+    # The most recently modified stream
+    return batch_response(_tailer().current)
+
+
+@live.route("/data/<stream_id>")
+def stream_data(stream_id):
+    file = _tailer().streams.get(stream_id)
+    if file is None:
+        return jsonify({"error": f"Unknown stream {stream_id}"}), 404
+    return batch_response(file)
+
+
+def stats_response(file):
+    # ?seconds= sets the window the recent stats and the dominant frequency are taken over
+    seconds = request.args.get("seconds", default=2.0, type=float)
+    if not math.isfinite(seconds) or seconds <= 0:
+        return jsonify({"error": "seconds must be a positive number"}), 400
+    stats = _tailer().stats(file, seconds) if file else None
+    if stats is None:
+        return jsonify({"error": "No stream files found"}), 404
+    stats["filename"] = os.path.basename(file)
+    return jsonify(stats)
+
+
+@live.route("/stats")
+def current_stats():
+    return stats_response(_tailer().current)
+
+
+@live.route("/stats/<stream_id>")
+def stream_stats(stream_id):
+    file = _tailer().streams.get(stream_id)
+    if file is None:
+        return jsonify({"error": f"Unknown stream {stream_id}"}), 404
+    return stats_response(file)
+
+
+@live.route("/streams")
+def streams():
+    tailer = _tailer()
+    mtimes = dict(current_app.extensions["live"]["index"].files())
+    listing = [{"id": stream_id, "filename": os.path.basename(path), "samples": tailer.count(path),
+                "mtime": mtimes.get(path)}
+               for stream_id, path in tailer.streams.items()]
+    return jsonify({"streams": listing})
+
+
+@live.route("/multi")
+def multi():
+    return render_template_string(MULTI_PAGE, trace_points=TRACE_POINTS, webgl_points=WEBGL_POINTS)
+
+
+@live.route("/stream")
+def stream():
+    # Server-Sent Events: one long-lived connection per browser, pushed a batch whenever the tailer sees new samples
+    tailer = _tailer()
+    since = request.args.get("since", default=0, type=int)
+    sent_file = request.args.get("file", "")
+    sent_generation = request.args.get("generation", type=int)
+    # ?window=<samples> caps every batch, most of all the first one after the followed file changes
+    window = request.args.get("window", default=TRACE_POINTS, type=int)
+    if window < 0:
+        return jsonify({"error": "window must not be negative"}), 400
+
+    def events(since, sent_file, sent_generation):
+        STREAM_CLIENTS.inc()
+        try:
+            yield from follow(since, sent_file, sent_generation)
+        finally:
+            STREAM_CLIENTS.dec()  # also runs when the client disconnects and the generator is closed
+
+    def follow(since, sent_file, sent_generation):
+        while True:
+            file = tailer.current
+            filename = os.path.basename(file) if file else "No stream files found"
+            if filename != sent_file:
+                since = 0
+            try:
+                if file:
+                    start, values, cursor, generation = tailer.read(file, since, refresh=False, window=window,
+                                                                    generation=sent_generation)
+                else:
+                    start, values, cursor, generation = 0, np.empty(0), 0, 0
+            except Exception:
+                start, values, cursor, generation = 0, np.empty(0), 0, 0
+                filename = "Error reading file"
+            if len(values) or filename != sent_file or generation != sent_generation:
+                SAMPLES_SERVED.inc(len(values), route="stream")
+                with STAGE_SECONDS.time(stage="encode"):
+                    payload = json.dumps({"values": values.tolist(), "filename": filename, "start": start,
+                                          "cursor": cursor, "generation": generation})
+                yield f"data: {payload}\n\n"
+            since, sent_file, sent_generation = cursor, filename, generation
+            if not tailer.wait(file, cursor, timeout=15, generation=generation):
+                yield ": keepalive\n\n"  # lets the server notice closed connections
+
+    return Response(events(since, sent_file, sent_generation), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,188 @@
+import bisect
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Blueprint, Response, g, request
+
+# In-process counters and histograms for the receiver, exposed at /metrics in the Prometheus
+# text format. Recording is a perf_counter pair and a short locked update, cheap enough to
+# leave on all the time.
+REGISTRY = []
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {} if labels else {(): 0}  # label values -> number
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labels)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labels, key)} {value}"
+
+
+class Gauge(Counter):
+    """A value that goes up and down, or is computed by `function` when scraped."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), function=None):
+        super().__init__(name, help, labels)
+        self.function = function
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.function is not None:
+            yield f"{self.name} {self.function()}"
+        else:
+            yield from super().samples()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values = {}  # label values -> [bucket counts..., +Inf count, sum]
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+        for key, counts in sorted(values.items()):
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                total += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, key, le)} {total}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {counts[-1]}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {total}"
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+# Clients seen per address, so the gauge below counts viewers rather than requests
+_last_seen = {}
+_last_seen_lock = threading.Lock()
+ACTIVE_WINDOW = 60
+
+
+def _active_clients():
+    cutoff = time.monotonic() - ACTIVE_WINDOW
+    with _last_seen_lock:
+        for address in [address for address, seen in _last_seen.items() if seen < cutoff]:
+            del _last_seen[address]
+        return len(_last_seen)
+
+
+STAGE_SECONDS = Histogram("dashboard_stage_seconds",
+                          "Time per stage: folder scan, file read, sample parsing, response encoding", ["stage"])
+BYTES_READ = Counter("dashboard_bytes_read_total", "Bytes read from sample files")
+SAMPLES_SERVED = Counter("dashboard_samples_served_total", "Samples sent to clients", ["route"])
+REQUEST_SECONDS = Histogram("dashboard_request_seconds", "Request handling time per endpoint", ["endpoint"])
+RESPONSES = Counter("dashboard_responses_total", "Responses per endpoint and status", ["endpoint", "status"])
+STREAM_CLIENTS = Gauge("dashboard_stream_clients", "Open /stream (Server-Sent Events) connections")
+ACTIVE_CLIENTS = Gauge("dashboard_active_clients", f"Client addresses seen in the last {ACTIVE_WINDOW} seconds",
+                       function=_active_clients)
+
+metrics = Blueprint("metrics", __name__)
+
+
+@metrics.route("/metrics")
+def metrics_page():
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_metrics(app, profile_dir=None):
+    """Time every request of `app` and serve /metrics.
+
+    With a `profile_dir`, a request with ?profile=1 also runs under cProfile and its
+    stats are dumped there as <endpoint>-<time>.prof (named in the X-Profile header).
+    """
+
+    @app.before_request
+    def start_request():
+        g.metrics_start = time.perf_counter()
+        with _last_seen_lock:
+            _last_seen[request.remote_addr] = time.monotonic()
+        if profile_dir and request.args.get("profile") == "1":
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def finish_request(response):
+        endpoint = request.endpoint or "unknown"
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(profile_dir, exist_ok=True)
+            path = os.path.join(profile_dir, f"{endpoint}-{time.time_ns()}.prof")
+            profiler.dump_stats(path)
+            response.headers["X-Profile"] = os.path.basename(path)
+        if "metrics_start" in g:
+            REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_start, endpoint=endpoint)
+        RESPONSES.inc(endpoint=endpoint, status=response.status_code)
+        return response
+
+    app.register_blueprint(metrics)
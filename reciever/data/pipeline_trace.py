@@ -0,0 +1,114 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+# Per-file stage timings of stream_v2.py, one JSON object per line:
+#   {"file", "bytes", "started", "finished", "ok", "error", "stages": {stage: seconds}, "total"}
+# Stages in pipeline order: ready (first seen until the upload settled), queue (held back while
+# the pool is full), pool (waiting inside the pool and for the result to be picked up), load,
+# plot, savefig, hash, analyze (in the worker), print (handing the plot to the print queue), move
+# (back in the monitor).
+# The print worker adds a record per print job once it was sent or given up on:
+#   {"kind": "print", "plots", "started", "finished", "ok", "attempts", "stages"}
+# with print_wait (in the print queue) and print_send (sending, retries and backoff included).
+STAGES = ["ready", "queue", "pool", "load", "plot", "savefig", "hash", "analyze", "print", "move",
+          "print_wait", "print_send"]
+
+
+class StageTimer:
+    """Times consecutive stages: each lap() records the time since the previous one."""
+
+    def __init__(self):
+        self.stages = {}
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+
+def write_record(path, record):
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def read_records(path, since=None):
+    """Records of `path`, only those finished after the epoch time `since` if given."""
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            if since is None or record["finished"] >= since:
+                records.append(record)
+    return records
+
+
+def summarize(records):
+    """Throughput over the traced period and percentiles of every stage."""
+    jobs = [record for record in records if record.get("kind") == "print"]
+    records = [record for record in records if record.get("kind") != "print"]
+    if not records:
+        return {"files": 0}
+    ok = [record for record in records if record["ok"]]
+    span = max(r["finished"] for r in records) - min(r["started"] for r in records)
+    megabytes = sum(record["bytes"] for record in ok) / 1e6
+    stages = {}
+    timed = ok + [job for job in jobs if job["ok"]]
+    for stage in STAGES + sorted({s for r in timed for s in r["stages"]} - set(STAGES)):
+        values = [record["stages"][stage] for record in timed if stage in record["stages"]]
+        if values:
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            stages[stage] = {"mean": round(float(np.mean(values)), 4), "p50": round(p50, 4), "p90": round(p90, 4),
+                             "p99": round(p99, 4), "max": round(max(values), 4), "total": round(sum(values), 3)}
+    return {
+        "files": len(records),
+        "failed": len(records) - len(ok),
+        "span_seconds": round(span, 1),
+        "files_per_minute": round(len(ok) / span * 60, 2) if span > 0 else None,
+        "megabytes": round(megabytes, 2),
+        "mb_per_second": round(megabytes / span, 3) if span > 0 else None,
+        "print_jobs": len(jobs),
+        "print_failed": len(jobs) - sum(job["ok"] for job in jobs),
+        "print_retries": sum(job["attempts"] - 1 for job in jobs),
+        "stages": stages,
+    }
+
+
+def print_summary(summary):
+    if not summary["files"]:
+        print("No files traced.")
+        return
+    print(f"{summary['files']} files ({summary['failed']} failed) over {summary['span_seconds']}s: "
+          f"{summary['files_per_minute']} files/min, {summary['mb_per_second']} MB/s")
+    if summary["print_jobs"]:
+        print(f"{summary['print_jobs']} print jobs ({summary['print_failed']} failed, "
+              f"{summary['print_retries']} retries)")
+    print(f"{'stage':<12}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}{'share':>8}")
+    busy = sum(stats["total"] for stats in summary["stages"].values()) or 1
+    for stage, stats in summary["stages"].items():
+        print(f"{stage:<12}" + "".join(f"{stats[key]:>10.3f}" for key in ("mean", "p50", "p90", "p99", "max"))
+              + f"{stats['total'] / busy:>8.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the stage trace written by stream_v2.py.")
+    parser.add_argument("trace", help="pipeline_trace.jsonl")
+    parser.add_argument("--last", type=float, help="only files finished in the last N minutes")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+    since = time.time() - args.last * 60 if args.last else None
+    summary = summarize(read_records(args.trace, since))
+    if args.json:
+        print(json.dumps(summary, indent=1))
+    else:
+        print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
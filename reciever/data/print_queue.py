@@ -0,0 +1,139 @@
+import os
+import queue
+import shutil
+import threading
+import time
+
+
+class CupsBackend:
+    """Prints through one long-lived CUPS connection, reconnecting after a failure."""
+
+    def __init__(self, printer_name):
+        self.printer_name = printer_name
+        self.conn = None
+
+    def _connect(self):
+        import cups  # only needed where plots are really printed
+        conn = cups.Connection()
+        if self.printer_name not in conn.getPrinters():
+            raise RuntimeError(f"Printer {self.printer_name} not found")
+        self.conn = conn
+        return conn
+
+    def submit(self, paths, title):
+        conn = self.conn or self._connect()
+        try:
+            if len(paths) > 1:
+                return conn.printFiles(self.printer_name, paths, title, {})
+            return conn.printFile(self.printer_name, paths[0], title, {})
+        except Exception:
+            self.conn = None  # the next attempt starts from a fresh connection
+            raise
+
+
+class SpoolBackend:
+    """Copies each job into a folder instead of printing, e.g. to run the pipeline without a printer."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def submit(self, paths, title):
+        job_id = time.time_ns()
+        for i, path in enumerate(paths):
+            shutil.copy(path, os.path.join(self.directory, f"{job_id}-{i}-{os.path.basename(path)}"))
+        return job_id
+
+
+class PrintQueue:
+    """Hands plots to a printer backend from a background thread, so a slow or offline printer
+    never holds up ingest.
+
+    At most `max_jobs` plots wait at a time, submit() refuses more instead of blocking.
+    Up to `batch_size` plots that arrive within `batch_wait` seconds go out as one job.
+    A failed job is retried `retries` times, waiting `backoff` seconds and doubling up to
+    `max_backoff` in between. `on_done(paths, ok, stages, attempts)` is called after every job
+    that was sent or given up on, `stages` holding how long its oldest plot waited in the queue
+    (print_wait) and how long sending took including retries (print_send).
+    """
+
+    def __init__(self, backend, max_jobs=50, batch_size=1, batch_wait=2.0, retries=5, backoff=1.0, max_backoff=60.0,
+                 title="Sine Wave Plot", on_done=None):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.title = title
+        self.on_done = on_done
+        self.jobs = queue.Queue(maxsize=max_jobs)
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, path):
+        """Queue `path` for printing, False if the queue is full."""
+        try:
+            self.jobs.put_nowait((path, time.monotonic()))
+            return True
+        except queue.Full:
+            print(f"Print queue full, not printing {path}")
+            return False
+
+    def close(self, timeout=None):
+        """Print what is still queued and stop the worker."""
+        if self._thread is not None:
+            self.jobs.put((None, time.monotonic()))
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _batch(self):
+        """(path, queued at) of the next job, ending in (None, ...) when the queue was closed."""
+        jobs = [self.jobs.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while jobs[-1][0] is not None and len(jobs) < self.batch_size:
+            try:
+                jobs.append(self.jobs.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return jobs
+
+    def _send(self, paths):
+        """(ok, attempts) of sending one job."""
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                job_id = self.backend.submit(paths, self.title)
+                print(f"Print job sent with ID: {job_id} ({len(paths)} plot{'s' if len(paths) > 1 else ''})")
+                return True, attempt + 1
+            except Exception as e:
+                if attempt == self.retries:
+                    print(f"Giving up printing {', '.join(paths)}: {e}")
+                    return False, attempt + 1
+                print(f"Printing failed ({e}), retrying in {delay:g}s")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    def _run(self):
+        while True:
+            jobs = self._batch()
+            stop = jobs[-1][0] is None
+            jobs = [(path, queued) for path, queued in jobs if path is not None]
+            if jobs:
+                paths = [path for path, _ in jobs]
+                started = time.monotonic()
+                ok, attempts = self._send(paths)
+                stages = {"print_wait": started - min(queued for _, queued in jobs),
+                          "print_send": time.monotonic() - started}
+                if self.on_done is not None:
+                    try:
+                        self.on_done(paths, ok, stages, attempts)
+                    except Exception as e:
+                        print(f"Error recording print job: {e}")
+            if stop:
+                return
@@ -1,36 +1,62 @@
-from flask import Flask, jsonify, render_template_string
+from flask import Flask, render_template_string
 import os
 import glob
 import socket
 from contextlib import closing
+from live_routes import init_live, TRACE_POINTS, WEBGL_POINTS
+from metrics import init_metrics
+from ingest_listener import IngestListener
 
 app = Flask(__name__)
 
 # Automatically set path to 'Plots' directory inside the current working directory
 network_share_path = os.path.join(os.getcwd(), "real time/data")
 
+# Index the share in memory and tail every active file with one background reader into
+# fixed-size ring buffers that all requests serve from (/data, /stream, /streams, /multi)
+ring_capacity = 200_000  # samples kept in memory per stream
+file_index, tailer = init_live(app, network_share_path, ring_capacity)
+
+# Samples streamed by realtime_signal_gen.py --send tcp://<this host>:5200 (or udp://) go straight
+# into the same buffers, skipping the share. persist=True also appends them to the share's file.
+# Each dashboard has its own port, outside find_open_port's range; DASHBOARD_INGEST_PORT overrides it
+ingest_port = int(os.environ.get("DASHBOARD_INGEST_PORT", 5200))
+ingest = IngestListener(tailer, network_share_path, port=ingest_port, persist=False)
+
+# Stage timings and counters at /metrics. Setting DASHBOARD_PROFILE_DIR enables ?profile=1,
+# which dumps a cProfile of that request into the folder
+init_metrics(app, profile_dir=os.environ.get("DASHBOARD_PROFILE_DIR"))
+
 HTML_PAGE = """
 <!DOCTYPE html>
 <html>
 <head>
     <title>Live Sinewave Plot - Most Recent File</title>
-    <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+    <script src="/static/plotly.min.js"></script>
+    <script src="/static/dashboard.js"></script>
 </head>
 <body>
     <h2>Live Sinewave Plot (Most Recent File)</h2>
     <div id="plot" style="width:90vw; height:70vh;"></div>
     <p id="filename"></p>
+    <p id="stats"></p>
+    <p><a href="/multi">All active streams</a></p>
 
     <script>
         let lastIndex = 0;
         let lastFile = "";
+        let lastGeneration = 0;  // the server bumps it when the file is replaced or truncated
 
-        const trace = {
-            x: [],
-            y: [],
-            mode: 'lines+markers',
-            name: 'Sinewave'
-        };
+        // ?keep=N overrides how many samples the trace keeps, see newTrace() in dashboard.js
+        const params = new URLSearchParams(window.location.search);
+        const keepPoints = parseInt(params.get('keep')) || {{ trace_points }};
+        const glPoints = {{ webgl_points }};
+        const viewPoints = 1000;  // samples in view
+        let trace = newTrace();
+
+        function emptyTrace() {
+            return { x: [], y: [], type: trace.traceType, mode: 'lines', name: 'Sinewave' };
+        }
 
         const layout = {
             margin: { t: 20 },
@@ -38,63 +64,85 @@ HTML_PAGE = """
             yaxis: { title: 'Amplitude' }
         };
 
-        Plotly.newPlot('plot', [trace], layout);
+        Plotly.newPlot('plot', [emptyTrace()], layout);
 
-        async function fetchData() {
-            const response = await fetch('/data');
-            return await response.json();
+        function fetchData() {
+            const query = `since=${lastIndex}&file=${encodeURIComponent(lastFile)}&generation=${lastGeneration}&window=1000`;
+            return fetchBatch('/data?' + query);
         }
 
-        async function updatePlot() {
-            const data = await fetchData();
+        function drawPending() {
+            drawBatches('plot', trace, keepPoints, glPoints, viewPoints);
+        }
+
+        function handleBatch(data) {
             const yData = data.values;
             const fileName = data.filename;
 
             // Reset if file changed or data shrank
-            if (fileName !== lastFile || yData.length < lastIndex) {
-                Plotly.react('plot', [{
-                    x: [],
-                    y: [],
-                    mode: 'lines+markers',
-                    name: 'Sinewave'
-                }], layout);
+            if (fileName !== lastFile || data.generation !== lastGeneration || data.start < lastIndex) {
+                trace = newTrace();
+                Plotly.react('plot', [emptyTrace()], layout);
                 lastIndex = 0;
                 lastFile = fileName;
+                lastGeneration = data.generation;
             }
 
-            if (yData.length > lastIndex) {
-                const newY = yData.slice(lastIndex);
-                const newX = Array.from({length: newY.length}, (_, i) => lastIndex + i);
+            // The server only sends samples from data.start on, so no slicing is needed
+            if (yData.length > 0) {
+                queueBatch(trace, data, keepPoints);
+                lastIndex = data.cursor;
+                requestDraw(drawPending);
+            }
 
-                Plotly.extendTraces('plot', {
-                    x: [newX],
-                    y: [newY]
-                }, [0]);
+            document.getElementById('filename').textContent = 'Current file: ' + fileName;
+        }
 
-                lastIndex = yData.length;
+        async function updatePlot() {
+            const data = await fetchData();
+            if (data !== null) {
+                handleBatch(data);
+            }
+        }
 
-                const maxPoints = 1000;
-                const minX = Math.max(0, lastIndex - maxPoints);
-                Plotly.relayout('plot', {
-                    'xaxis.range': [minX, lastIndex]
-                });
+        let pollTimer = null;
+        function startPolling() {
+            if (pollTimer === null) {
+                pollTimer = setInterval(updatePlot, 100);  // update every 100ms
             }
+        }
 
-            document.getElementById('filename').textContent = 'Current file: ' + fileName;
+        // Prefer the server push stream, fall back to polling /data if it fails
+        if (window.EventSource) {
+            const query = `since=${lastIndex}&file=${encodeURIComponent(lastFile)}&generation=${lastGeneration}&window=${keepPoints}`;
+            const source = new EventSource('/stream?' + query);
+            source.onmessage = (event) => handleBatch(JSON.parse(event.data));
+            source.onerror = () => {
+                source.close();
+                startPolling();
+            };
+        } else {
+            startPolling();
         }
 
-        setInterval(updatePlot, 100);  // update every 300ms
+        // Rolling stats of the current stream from /stats
+        async function updateStats() {
+            try {
+                const response = await fetch('/stats');
+                if (response.ok) {
+                    document.getElementById('stats').textContent = formatStats(await response.json());
+                }
+            } catch (error) {
+                console.error("Error fetching stats:", error);
+            }
+        }
+        updateStats();
+        setInterval(updateStats, 1000);
     </script>
 </body>
 </html>
 """
 
-def get_most_recent_txt_file(folder):
-    files = glob.glob(os.path.join(folder, "*.txt"))
-    if not files:
-        return None
-    return max(files, key=os.path.getmtime)
-
 def list_txt_files(folder):
     cwd = os.getcwd()
     print(f"Current working directory: {cwd}")
@@ -124,28 +172,12 @@ def get_local_ip():
 
 @app.route("/")
 def index():
-    return render_template_string(HTML_PAGE)
-
-@app.route("/data")
-def data():
-    file = get_most_recent_txt_file(network_share_path)
-    if file:
-        try:
-            with open(file, "r") as f:
-                lines = [line.strip() for line in f if line.strip()]
-            values = list(map(float, lines))
-            filename = os.path.basename(file)
-        except Exception:
-            values = []
-            filename = "Error reading file"
-    else:
-        values = []
-        filename = "No .txt files found"
-    return jsonify({"values": values, "filename": filename})
+    return render_template_string(HTML_PAGE, trace_points=TRACE_POINTS, webgl_points=WEBGL_POINTS)
 
 if __name__ == "__main__":
     list_txt_files(network_share_path)
     port = find_open_port()
     local_ip = get_local_ip()
+    ingest.start()
     print(f"Starting server at http://{local_ip}:{port}")
     app.run(host="0.0.0.0", port=port)
@@ -0,0 +1,201 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# Columnar sidecar written next to an archived recording, <stem>.cache/:
+#   meta.json   source name, size and mtime, row count, first and last epoch time, channel names and files
+#   epoch.npy   float64 'Epoch Time' column
+#   ch<i>.npy   float32 per channel, in the recording's column order
+#   epoch_<f>.npy, ch<i>_min_<f>.npy, ch<i>_max_<f>.npy
+#               min/max pyramid, one bucket per f samples for every f in PYRAMID_FACTORS
+# Loading memory-maps the .npy files, so re-reading a session skips pd.read_csv entirely.
+CACHE_VERSION = 2
+EPOCH_COLUMN = 'Epoch Time'
+PYRAMID_FACTORS = [10, 100, 1000]
+
+
+def reduce_buckets(values, k, ufunc):
+    """Apply ufunc (np.minimum/np.maximum) over consecutive buckets of k samples, the last one padded with its edge."""
+    values = np.asarray(values)
+    pad = -len(values) % k
+    if pad:
+        values = np.concatenate([values, np.repeat(values[-1:], pad)])
+    return ufunc.reduce(values.reshape(-1, k), axis=1)
+
+
+def minmax_pyramid(values, factors=PYRAMID_FACTORS):
+    """Min and max of every bucket of f samples for each factor, each level built from the previous one."""
+    lo = hi = values
+    previous = 1
+    levels = {}
+    for factor in factors:
+        k = factor // previous
+        lo = reduce_buckets(lo, k, np.minimum)
+        hi = reduce_buckets(hi, k, np.maximum)
+        levels[factor] = (lo, hi)
+        previous = factor
+    return levels
+
+
+class Recording:
+    """Channels and timestamps of one recording as (memory-mapped) NumPy arrays."""
+
+    def __init__(self, channels, epoch, arrays, cache_dir=None, levels=None):
+        self.channels = channels  # channel names, file column order without 'Epoch Time'
+        self.epoch = epoch
+        self.arrays = arrays  # channel name -> samples
+        self.cache_dir = cache_dir
+        self.levels = levels or {}  # factor -> {"epoch", "min": {name: array}, "max": {name: array}}
+
+    def __len__(self):
+        return len(self.epoch)
+
+    def __getitem__(self, name):
+        return self.epoch if name == EPOCH_COLUMN else self.arrays[name]
+
+    def values(self):
+        """All channels as one (samples, channels) array."""
+        return np.column_stack([self.arrays[name] for name in self.channels])
+
+    def envelope(self, name, start=None, end=None, points=2000):
+        """Min/max envelope of `name` between epoch times `start` and `end` in about points/2 buckets.
+
+        Reads the coarsest pyramid level that still resolves the range, so the cost
+        depends on `points` rather than on how many raw samples the range spans.
+        Returns (factor, bucket start times, mins, maxs).
+        """
+        i0 = 0 if start is None else int(np.searchsorted(self.epoch, start, 'left'))
+        i1 = len(self.epoch) if end is None else int(np.searchsorted(self.epoch, end, 'right'))
+        buckets = max(points // 2, 1)
+        factor = 1
+        for f in sorted(self.levels):
+            if (i1 - i0) / f >= buckets:
+                factor = f
+        if factor == 1:
+            t = self.epoch[i0:i1]
+            lo = hi = self.arrays[name][i0:i1]
+        else:
+            level = self.levels[factor]
+            b0, b1 = i0 // factor, -(-i1 // factor)
+            t = level['epoch'][b0:b1]
+            lo, hi = level['min'][name][b0:b1], level['max'][name][b0:b1]
+
+        # Merge what is left down to the requested number of buckets
+        k = -(-len(t) // buckets)
+        if k > 1:
+            t = t[::k]
+            lo, hi = reduce_buckets(lo, k, np.minimum), reduce_buckets(hi, k, np.maximum)
+        return factor, t, lo, hi
+
+
+def cache_path(file_path, cache_dir=None):
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(cache_dir or os.path.dirname(file_path), f'{stem}.cache')
+
+
+def write_cache(file_path, data, cache_dir=None):
+    """Write the sidecar for `file_path` from its parsed DataFrame, replacing any older one."""
+    target = cache_path(file_path, cache_dir)
+    tmp = target + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        _write_sidecar(file_path, data, tmp)
+        # Swap the finished directory in, so readers never see a half written cache
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp, target)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)  # only left over when writing failed
+    return target
+
+
+def _write_sidecar(file_path, data, tmp):
+    channels = [name for name in data.columns if name != EPOCH_COLUMN]
+    files = {}
+    for i, name in enumerate(channels):
+        files[name] = f'ch{i}.npy'
+        np.save(os.path.join(tmp, files[name]), data[name].to_numpy(dtype=np.float32))
+    epoch = data[EPOCH_COLUMN].to_numpy(dtype=np.float64)
+    np.save(os.path.join(tmp, 'epoch.npy'), epoch)
+
+    factors = [f for f in PYRAMID_FACTORS if f < len(data)]
+    for factor in factors:
+        np.save(os.path.join(tmp, f'epoch_{factor}.npy'), epoch[::factor])
+    for i, name in enumerate(channels):
+        levels = minmax_pyramid(data[name].to_numpy(dtype=np.float32), factors)
+        for factor, (lo, hi) in levels.items():
+            np.save(os.path.join(tmp, f'ch{i}_min_{factor}.npy'), lo)
+            np.save(os.path.join(tmp, f'ch{i}_max_{factor}.npy'), hi)
+
+    st = os.stat(file_path)
+    meta = {
+        'version': CACHE_VERSION,
+        'source': os.path.basename(file_path),
+        'source_size': st.st_size,
+        'source_mtime_ns': st.st_mtime_ns,
+        'rows': len(data),
+        'start': float(epoch[0]) if len(epoch) else None,
+        'end': float(epoch[-1]) if len(epoch) else None,
+        'channels': channels,
+        'files': files,
+        'pyramid': factors,
+    }
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+
+
+def read_cache(cache_dir, source_size=None, source_mtime_ns=None):
+    """Load a sidecar with memory-mapped columns, None if it's missing, stale or from another version.
+
+    The sidecar is stale when the raw text's `source_size` or `source_mtime_ns` differ from
+    what it was built from, e.g. a same-size re-upload under an old name. Without a
+    `source_size` there is no raw text to rebuild from, so older versions are still
+    loaded, just without the pyramid.
+    """
+    try:
+        with open(os.path.join(cache_dir, 'meta.json')) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if meta.get('version') != CACHE_VERSION and source_size is not None:
+        return None
+    if source_size is not None and meta['source_size'] != source_size:
+        return None
+    if source_mtime_ns is not None and meta.get('source_mtime_ns') != source_mtime_ns:
+        return None
+    epoch = np.load(os.path.join(cache_dir, 'epoch.npy'), mmap_mode='r')
+    arrays = {name: np.load(os.path.join(cache_dir, meta['files'][name]), mmap_mode='r')
+              for name in meta['channels']}
+    levels = {}
+    for factor in meta.get('pyramid', []):
+        levels[factor] = {
+            'epoch': np.load(os.path.join(cache_dir, f'epoch_{factor}.npy'), mmap_mode='r'),
+            'min': {}, 'max': {},
+        }
+        for i, name in enumerate(meta['channels']):
+            for kind in ('min', 'max'):
+                levels[factor][kind][name] = np.load(os.path.join(cache_dir, f'ch{i}_{kind}_{factor}.npy'),
+                                                     mmap_mode='r')
+    return Recording(meta['channels'], epoch, arrays, cache_dir, levels)
+
+
+def load_recording(file_path, cache_dir=None):
+    """Load a recording, preferring its sidecar and creating the sidecar on first read.
+
+    `cache_dir` is where the sidecar lives, by default next to the file. A recording
+    whose raw text was dropped from the archive loads from the sidecar alone.
+    """
+    target = cache_path(file_path, cache_dir)
+    try:
+        st = os.stat(file_path)
+        recording = read_cache(target, st.st_size, st.st_mtime_ns)
+    except FileNotFoundError:
+        recording = read_cache(target)
+    if recording is not None:
+        return recording
+    data = pd.read_csv(file_path, sep='\t')
+    write_cache(file_path, data, cache_dir)
+    return read_cache(target)
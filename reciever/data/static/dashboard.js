@@ -0,0 +1,99 @@
+// Shared by the live pages: the current stream of app.py and realtime_stream.py and every
+// active stream on /multi (live_routes.py). Loaded after plotly.min.js.
+
+// Binary batch from /data, see wire_format.py for the layout
+function decodeBatch(buffer) {
+    const view = new DataView(buffer);
+    const size = view.getUint8(4);
+    const nameLength = view.getUint16(6, true);
+    const start = Number(view.getBigUint64(8, true));
+    const cursor = Number(view.getBigUint64(16, true));
+    const count = view.getUint32(24, true);
+    const filename = new TextDecoder().decode(new Uint8Array(buffer, 28, nameLength));
+    const offset = Math.ceil((28 + nameLength) / 8) * 8;
+    const values = size === 8 ? new Float64Array(buffer, offset, count)
+                              : new Float32Array(buffer, offset, count);
+    return { values: values, filename: filename, start: start, cursor: cursor };
+}
+
+// GET a /data URL as a binary batch, null if the server refused. The wire format has no room
+// for the stream generation, it comes in the X-Stream-Generation header.
+async function fetchBatch(url) {
+    const response = await fetch(url, {
+        headers: { 'Accept': 'application/octet-stream' }
+    });
+    if (!response.ok) {
+        return null;
+    }
+    const batch = decodeBatch(await response.arrayBuffer());
+    batch.generation = Number(response.headers.get('X-Stream-Generation'));
+    return batch;
+}
+
+// State of one live trace. Up to keepPoints samples stay in it, extendTraces drops the oldest
+// so a page holds constant memory however long it is open. Past glPoints it is redrawn with
+// WebGL. Batches arriving between two frames are drawn together.
+function newTrace() {
+    return { traceType: 'scatter', held: 0, pending: [], pendingCount: 0 };
+}
+
+function queueBatch(trace, batch, keepPoints) {
+    trace.pending.push(batch);
+    trace.pendingCount += batch.values.length;
+    // rAF pauses in a background tab, keep no more than the trace would
+    while (trace.pendingCount - trace.pending[0].values.length >= keepPoints) {
+        trace.pendingCount -= trace.pending.shift().values.length;
+    }
+}
+
+// Append the queued batches to the plot in `div`, showing the last viewPoints samples
+function drawBatches(div, trace, keepPoints, glPoints, viewPoints) {
+    if (trace.pending.length === 0) {
+        return;
+    }
+    const newX = new Array(trace.pendingCount);
+    const newY = new Array(trace.pendingCount);
+    let n = 0;
+    for (const batch of trace.pending) {
+        for (let i = 0; i < batch.values.length; i++, n++) {
+            newX[n] = batch.start + i;
+            newY[n] = batch.values[i];
+        }
+    }
+    const end = trace.pending[trace.pending.length - 1].cursor;
+    trace.pending = [];
+    trace.pendingCount = 0;
+
+    trace.held = Math.min(trace.held + n, keepPoints);
+    if (trace.traceType === 'scatter' && trace.held >= glPoints) {
+        trace.traceType = 'scattergl';
+        Plotly.restyle(div, { type: trace.traceType }, [0]);
+    }
+    Plotly.extendTraces(div, { x: [newX], y: [newY] }, [0], keepPoints);
+    Plotly.relayout(div, {
+        'xaxis.range': [Math.max(0, end - viewPoints), end]
+    });
+}
+
+// Call draw() on the next animation frame, once however many batches arrive before it
+let drawRequested = false;
+function requestDraw(draw) {
+    if (!drawRequested) {
+        drawRequested = true;
+        requestAnimationFrame(() => {
+            drawRequested = false;
+            draw();
+        });
+    }
+}
+
+// Rolling stats from /stats, over the last couple of seconds
+function formatStats(stats) {
+    const w = stats.window;
+    if (!w.samples) {
+        return '';
+    }
+    const frequency = w.frequency === null ? '-' : w.frequency.toFixed(2) + ' Hz';
+    return `Frequency ${frequency} | Amplitude ${w.amplitude.toFixed(3)} | RMS ${w.rms.toFixed(3)} | ` +
+           `Mean ${w.mean.toFixed(3)} | Min ${w.min.toFixed(3)} | Max ${w.max.toFixed(3)}`;
+}
@@ -0,0 +1,52 @@
+import numpy as np
+
+
+class RunningStats:
+    """Count, min, max, sum and sum of squares of every sample seen, updated a batch at a time."""
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.sumsq += float(np.dot(values, values))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def summary(self):
+        if not self.count:
+            return {"samples": 0}
+        mean = self.sum / self.count
+        return {"samples": self.count, "min": self.min, "max": self.max, "mean": mean,
+                "rms": (self.sumsq / self.count) ** 0.5}
+
+
+def dominant_frequency(values, sample_rate, pad=8):
+    """Frequency of the strongest spectral peak, from a Hann windowed FFT zero-padded
+    `pad` times so the peak falls between bins less coarsely."""
+    if len(values) < 4:
+        return None
+    x = (values - values.mean()) * np.hanning(len(values))
+    n = 1 << int(np.ceil(np.log2(len(values) * pad)))
+    spectrum = np.abs(np.fft.rfft(x, n))
+    spectrum[0] = 0
+    if not spectrum.any():
+        return 0.0
+    return float(np.argmax(spectrum) * sample_rate / n)
+
+
+def window_stats(values, sample_rate):
+    """Stats of the newest samples, costs the same however long the stream has been running."""
+    if not len(values):
+        return {"samples": 0}
+    low, high = float(values.min()), float(values.max())
+    return {"samples": len(values), "seconds": len(values) / sample_rate, "min": low, "max": high,
+            "mean": float(values.mean()), "rms": float(np.sqrt(np.dot(values, values) / len(values))),
+            "amplitude": (high - low) / 2, "frequency": dominant_frequency(values, sample_rate)}
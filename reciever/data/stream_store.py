@@ -0,0 +1,350 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from binary_stream import BinaryStream
+from metrics import BYTES_READ, STAGE_SECONDS
+from stream_stats import RunningStats, window_stats
+
+
+class RingBuffer:
+    """Preallocated float64 ring buffer addressed by absolute sample index.
+
+    Only the last `capacity` samples are kept, so memory per stream stays fixed.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.empty(capacity, dtype=np.float64)
+        self.count = 0  # samples ever appended, i.e. the index of the next sample
+
+    @property
+    def first(self):
+        """Index of the oldest sample still held."""
+        return max(0, self.count - self.capacity)
+
+    def append(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) > self.capacity:
+            self.count += len(values) - self.capacity
+            values = values[-self.capacity:]
+        pos = self.count % self.capacity
+        head = min(len(values), self.capacity - pos)
+        self.data[pos:pos + head] = values[:head]
+        self.data[:len(values) - head] = values[head:]
+        self.count += len(values)
+
+    def slice(self, start, stop=None):
+        """Copy of the samples with index in [start, stop), clipped to what is held."""
+        start = max(start, self.first)
+        stop = self.count if stop is None else min(stop, self.count)
+        if stop <= start:
+            return np.empty(0, dtype=np.float64)
+        i = start % self.capacity
+        n = stop - start
+        if i + n <= self.capacity:
+            return self.data[i:i + n].copy()
+        return np.concatenate((self.data[i:], self.data[:i + n - self.capacity]))
+
+    def tail(self, n):
+        return self.slice(self.count - n)
+
+
+def parse_samples(chunk, name=""):
+    """Parse newline separated samples, skipping lines that aren't numbers."""
+    try:
+        return np.array(chunk.split(), dtype=np.float64)
+    except ValueError:
+        values = []
+        for line in chunk.split():
+            try:
+                values.append(float(line))
+            except ValueError:
+                print(f"Skipping bad sample in {name}: {line!r}")
+        return np.array(values, dtype=np.float64)
+
+
+def stream_id(path):
+    """Streams are named after their file, e.g. sinewave_alice.txt or .bin -> sinewave_alice."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+class StreamTailer:
+    """Tail sample files by byte offset into per-file ring buffers shared by all requests."""
+
+    def __init__(self, capacity=200_000, sample_rate=30, push_timeout=60, sticky_seconds=5, stats_interval=0.5):
+        self.capacity = capacity
+        self.sample_rate = sample_rate  # for text files, binary files carry their own
+        self.push_timeout = push_timeout  # seconds a pushed stream stays listed after its last batch
+        # The followed file is kept while it grew in the last sticky_seconds, so two files being
+        # written at once don't make it flip back and forth
+        self.sticky_seconds = sticky_seconds
+        # Window stats are recomputed by the background reader at most this often per stream and
+        # window, requests only read the last result
+        self.stats_interval = stats_interval
+        self._lock = threading.Condition()
+        self._files = {}  # path -> {"offset", "inode", "buffer", "stats", "generation", "windows", "grown_at"}
+        self._generation = 0  # bumped whenever a stream starts over, see _reset
+        self._thread = None
+        self._failing = set()  # paths that could not be read, logged once until they read again
+        self.current = None  # newest file the background reader is following
+        self.streams = {}  # stream id -> path of every followed file
+
+    def _reset(self, path, inode):
+        # A new generation tells readers holding a cursor into the old buffer to start over
+        self._generation += 1
+        state = {"offset": 0, "inode": inode, "buffer": RingBuffer(self.capacity), "stats": RunningStats(),
+                 "generation": self._generation}
+        self._files[path] = state
+        self._lock.notify_all()
+        return state
+
+    def _update(self, path):
+        state = self._files.get(path)
+        if state is not None and state.get("pushed"):
+            return state  # fed by push(), even if the file is being written as well
+        st = os.stat(path)
+        inode = (st.st_dev, st.st_ino)
+        state = self._files.get(path)
+        # Start over if the file was replaced or truncated underneath us
+        if state is None or state["inode"] != inode or st.st_size < state["offset"]:
+            state = self._reset(path, inode)
+
+        if path.endswith(".bin"):
+            self._update_binary(path, state)
+        elif st.st_size > state["offset"]:
+            # Re-read the last bytes already consumed too: if they changed, the file was rewritten
+            # in place (or replaced under a reused inode) and has already grown past our offset
+            tail = state.get("tail", b"")
+            with STAGE_SECONDS.time(stage="read"), open(path, "rb") as f:
+                f.seek(state["offset"] - len(tail))
+                chunk = f.read(st.st_size - state["offset"] + len(tail))
+                if chunk[:len(tail)] != tail:
+                    state = self._reset(path, inode)
+                    f.seek(0)
+                    chunk = f.read(st.st_size)
+                else:
+                    chunk = chunk[len(tail):]
+            tail = state.get("tail", b"")
+            BYTES_READ.inc(len(chunk))
+            # Only consume complete lines, a partial last line is picked up next poll
+            end = chunk.rfind(b"\n") + 1
+            if end:
+                state["offset"] += end
+                state["tail"] = (tail + chunk[:end])[-64:]
+                with STAGE_SECONDS.time(stage="parse"):
+                    values = parse_samples(chunk[:end], os.path.basename(path))
+                state["buffer"].append(values)
+                state["stats"].update(values)
+        return state
+
+    def _update_binary(self, path, state):
+        reader = state.get("reader")
+        if reader is None:
+            try:
+                reader = state["reader"] = BinaryStream(path)
+            except EOFError:
+                return  # header not written yet
+        with STAGE_SECONDS.time(stage="read"):
+            records = reader.refresh()
+            buffer = state["buffer"]
+            if records > buffer.count:
+                BYTES_READ.inc((records - buffer.count) * reader.record_size)
+                values = reader.samples(buffer.count, records)
+                buffer.append(values)
+                state["stats"].update(values.astype(np.float64))
+        state["offset"] = reader.header_size + records * reader.record_size
+
+    def push(self, path, values, start=None, session=None):
+        """Append samples received over the network for `path`, a file name in the watched folder
+        whether or not the file exists. From then on the file itself is no longer tailed.
+
+        `start` is the sender's index of the first sample, used to drop batches resent after a
+        reconnect and to log lost ones. A new `session` (a sender that was restarted) counts
+        from 0 again and continues the stream. Returns the samples that were new.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        with self._lock:
+            state = self._files.get(path)
+            if state is None:
+                state = self._reset(path, None)
+            if not state.get("pushed"):
+                state.update(pushed=True, pushed_since=time.monotonic(), sent=0, session=session)
+            if session != state["session"]:
+                print(f"{stream_id(path)}: sender restarted")
+                state.update(sent=0, session=session)
+            if start is not None:
+                expected = state["sent"]
+                end = start + len(values)
+                if start < expected:
+                    values = values[expected - start:]  # already have these
+                elif start > expected:
+                    print(f"{stream_id(path)}: lost {start - expected} samples")
+                state["sent"] = max(expected, end)
+            state["pushed_at"] = time.monotonic()
+            if len(values):
+                state["grown_at"] = state["pushed_at"]
+                state["buffer"].append(values)
+                state["stats"].update(values)
+                self._lock.notify_all()
+        return values
+
+    def read(self, path, since=0, refresh=True, window=None, until=None, generation=None):
+        """Return (start, values, cursor, generation) with the samples of `path` in [since, until).
+
+        With `window`, at most the last `window` samples are returned. Samples of text
+        streams that have dropped out of the ring buffer are skipped, so `start` may be
+        past `since`; binary streams read them back from the file. A `since` taken from
+        another `generation` (the file was replaced or truncated since) counts from 0.
+        """
+        with self._lock:
+            if refresh or path not in self._files:
+                state = self._update(path)
+            else:
+                state = self._files[path]
+            buffer = state["buffer"]
+            cursor = buffer.count
+            if generation is not None and generation != state["generation"]:
+                since = 0
+            start = since if 0 <= since <= cursor else 0
+            if window is not None:
+                start = max(start, cursor - window)
+            if start < buffer.first and state.get("reader") is not None:
+                # Binary streams can serve history that has left the ring buffer straight from the map
+                return start, state["reader"].samples(start, until).astype(np.float64), cursor, state["generation"]
+            start = max(start, buffer.first)
+            return start, buffer.slice(start, until), cursor, state["generation"]
+
+    def follow(self, find_files, interval=0.05):
+        """Start the single background reader that tails every file find_files() returns (newest first)
+        and wakes waiting streams. Files that drop out of the list are released."""
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            def loop():
+                while True:
+                    try:
+                        paths = find_files()
+                        with self._lock:
+                            # Streams pushed over the network come first, the newest session leading
+                            now = time.monotonic()
+                            pushed = [path for path, state in self._files.items() if state.get("pushed")]
+                            for path in pushed:
+                                if now - self._files[path]["pushed_at"] >= self.push_timeout:
+                                    del self._files[path]  # sender gone, tail the file again if it has one
+                            pushed = sorted((path for path in pushed if path in self._files),
+                                            key=lambda path: self._files[path]["pushed_since"], reverse=True)
+                            paths = pushed + [path for path in paths if path not in pushed]
+                            current = paths[0] if paths else None
+                            followed = self._files.get(self.current)
+                            if (self.current in paths and followed is not None
+                                    and now - followed.get("grown_at", -np.inf) < self.sticky_seconds):
+                                current = self.current
+                            changed = current != self.current
+                            self.current = current
+                            self.streams = {stream_id(path): path for path in paths}
+                            for path in set(self._files) - set(paths):
+                                del self._files[path]
+                            self._failing &= set(paths)
+                        # Take the lock per file so requests can interleave with a slow share
+                        for path in paths:
+                            with self._lock:
+                                before = self._files[path]["buffer"].count if path in self._files else -1
+                                try:
+                                    state = self._update(path)
+                                    if state["buffer"].count != before:
+                                        state["grown_at"] = time.monotonic()
+                                        changed = True
+                                    self._failing.discard(path)
+                                except FileNotFoundError:
+                                    pass  # removed since the index saw it, dropped on the next pass
+                                except (OSError, ValueError) as e:
+                                    # e.g. a .bin that isn't SWB1 or a file we may not read, the others go on
+                                    if path not in self._failing:
+                                        self._failing.add(path)
+                                        print(f"Skipping {path}: {e}")
+                        if changed:
+                            with self._lock:
+                                self._lock.notify_all()
+                        self._refresh_stats()
+                    except Exception as e:
+                        print(f"Error following files: {e}")
+                    time.sleep(interval)
+
+            self._thread = threading.Thread(target=loop, daemon=True)
+            self._thread.start()
+
+    def _sample_rate(self, state):
+        reader = state.get("reader")
+        return reader.sample_rate if reader is not None else self.sample_rate
+
+    def _refresh_stats(self):
+        """Recompute the window stats requested of streams that grew since, so requests don't
+        redo the FFT. Windows nobody asked for in the last minute are dropped."""
+        now = time.monotonic()
+        jobs = []
+        with self._lock:
+            for state in self._files.values():
+                windows = state.get("windows", {})
+                for window, entry in list(windows.items()):
+                    if now - entry["requested_at"] > 60:
+                        del windows[window]
+                    elif entry["cursor"] != state["buffer"].count and now - entry["computed_at"] >= self.stats_interval:
+                        jobs.append((entry, state["buffer"].tail(window), state["buffer"].count,
+                                     self._sample_rate(state)))
+        for entry, recent, cursor, sample_rate in jobs:
+            result = window_stats(recent, sample_rate)
+            with self._lock:
+                entry.update(result=result, cursor=cursor, computed_at=time.monotonic())
+
+    def stats(self, path, seconds=2.0):
+        """Running stats of everything `path` has held plus min/max/mean/RMS and dominant
+        frequency of its last `seconds`, None if `path` isn't being followed.
+
+        The window stats come from the background reader, only a window asked for the first
+        time is computed here.
+        """
+        with self._lock:
+            state = self._files.get(path)
+            if state is None:
+                return None
+            sample_rate = self._sample_rate(state)
+            # Clamp before int(): a huge ?seconds= is an overflowing float, not a bigger window
+            window = int(max(min(seconds * sample_rate, self.capacity), 8))
+            total = state["stats"].summary()
+            windows = state.setdefault("windows", {})
+            entry = windows.get(window)
+            if entry is not None:
+                entry["requested_at"] = time.monotonic()
+                return {"sample_rate": sample_rate, "cursor": entry["cursor"], "window": entry["result"],
+                        "total": total}
+            recent = state["buffer"].tail(window)
+            cursor = state["buffer"].count
+        result = window_stats(recent, sample_rate)
+        with self._lock:
+            now = time.monotonic()
+            windows[window] = {"result": result, "cursor": cursor, "computed_at": now, "requested_at": now}
+        return {"sample_rate": sample_rate, "cursor": cursor, "window": result, "total": total}
+
+    def count(self, path):
+        """Samples seen so far in `path`, 0 if it isn't being followed."""
+        with self._lock:
+            state = self._files.get(path)
+            return state["buffer"].count if state else 0
+
+    def wait(self, path, cursor, timeout=None, generation=None):
+        """Block until the followed file changes, `path` starts over (a generation other than
+        `generation`) or has samples past `cursor`. False on timeout."""
+        def ready():
+            if self.current != path:
+                return True
+            state = self._files.get(path)
+            if path is None or state is None:
+                return False
+            return state["buffer"].count > cursor or (generation is not None and state["generation"] != generation)
+
+        with self._lock:
+            return self._lock.wait_for(ready, timeout)
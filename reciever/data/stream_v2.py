@@ -1,11 +1,21 @@
 import os
-import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # plots are only rendered to files, also inside worker processes
 import matplotlib.pyplot as plt
 import time
 import shutil
 from datetime import datetime
-import cups
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from artifact_report import content_hash, write_report
+from decimate import minmax_indices
+from recording_cache import cache_path, load_recording, read_cache
+from ingest_ledger import IngestLedger
+from inotify_watch import DirectoryWatch, IN_CLOSE_WRITE, IN_DELETE, IN_MOVED_FROM
+from pipeline_trace import StageTimer, write_record
+from print_queue import CupsBackend, PrintQueue, SpoolBackend
 
 # Specify your network share directory
 directory_to_save = r'/data/post processing/'
@@ -17,119 +27,407 @@ saved_plots_directory = os.path.join(directory_to_save, 'saved plots')
 os.makedirs(saved_data_directory, exist_ok=True)
 os.makedirs(saved_plots_directory, exist_ok=True)
 
-processed_files = set()  # To keep track of processed files
+# Every file taken on, with its size, mtime, content hash and the stage it reached, kept on
+# disk so a restart resumes where the last run stopped instead of printing plots again
+ledger_path = os.path.join(directory_to_save, 'ingest_ledger.sqlite')
 
-def is_file_ready(file_path, wait_time=5, check_interval=0.5):
-    """Check if the file upload is complete by monitoring its size."""
-    initial_size = os.path.getsize(file_path)
-    time.sleep(wait_time)  # Wait for the file write operation to potentially complete
+# Rendering runs in a process pool so a batch of uploads uses every core
+plot_workers = max(1, (os.cpu_count() or 2) - 1)
+max_queued_plots = 2 * plot_workers  # files handed to the pool at once, the rest wait their turn
+max_pool_crashes = 3  # a file in flight this many times when a worker died is given up on
 
-    # Check the size multiple times
-    for _ in range(int(wait_time / check_interval)):
-        time.sleep(check_interval)
-        final_size = os.path.getsize(file_path)
-        if final_size != initial_size:
-            initial_size = final_size  # Update the size if it changed
-        else:
-            return True  # File is ready if the size hasn't changed
-    return False  # File is still being written
+# Draw min/max envelopes at the PNG's pixel width instead of every sample, so render
+# time no longer grows with recording length. False plots full resolution.
+fast_plots = True
+figure_templates = {}  # num_signals -> figure, axes and lines, reused across files in each process
+
+# Ingest writes a float32 columnar sidecar (<name>.cache) into 'saved data' that later
+# reads memory-map. With keep_raw_text = False only the sidecar is archived, which is
+# a fraction of the size of the tab-separated text.
+keep_raw_text = True
+
+# Spike and flat-zone report per file, written next to its plot as <name>.json and
+# skipped when the report already matches the file's content hash
+analyze_artifacts = True
+
+# Per-file stage timings as JSON lines, summarized by: python pipeline_trace.py <trace_log>
+# None disables the trace.
+trace_log = os.path.join(directory_to_save, 'pipeline_trace.jsonl')
+
+# Define the printer name (check if it matches exactly with the name CUPS lists)
+printer_name = 'Canon_TR8600_series'  # Replace with your configured printer's name
+
+# Plots are printed by a background worker with its own CUPS connection, so ingest never
+# waits for the printer. print_batch_size > 1 combines plots finished close together into
+# one job. Setting print_spool_directory copies the plots there instead of printing.
+max_queued_prints = 50
+print_batch_size = 1
+print_spool_directory = None
+
+class ReadinessTracker:
+    """Track size and mtime of files still being uploaded, without blocking on any of them.
+
+    A file is ready once it hasn't changed for `stable_seconds`, or for `closed_seconds`
+    after inotify saw the writer close it.
+    """
+
+    def __init__(self, stable_seconds=2.0, closed_seconds=0.5):
+        self.stable_seconds = stable_seconds
+        self.closed_seconds = closed_seconds
+        self.pending = {}  # path -> [size, mtime, unchanged since, quiet time needed]
+
+    def observe(self, file_path, closed=False):
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            self.pending.pop(file_path, None)
+            return
+        now = time.monotonic()
+        entry = self.pending.get(file_path)
+        if entry is None or entry[0] != st.st_size or entry[1] != st.st_mtime:
+            entry = self.pending[file_path] = [st.st_size, st.st_mtime, now, self.stable_seconds]
+        if closed:
+            entry[3] = self.closed_seconds
+
+    def discard(self, file_path):
+        self.pending.pop(file_path, None)
+
+    def ready(self):
+        """Re-check every pending file and return (and forget) the ones that settled."""
+        now = time.monotonic()
+        settled = []
+        for file_path in list(self.pending):
+            self.observe(file_path)
+            entry = self.pending.get(file_path)
+            if entry is not None and now - entry[2] >= entry[3]:
+                settled.append(file_path)
+                del self.pending[file_path]
+        return settled
 
-def plot_signals(file_path):
+def figure_template(num_signals):
+    """Figure, axes and lines for `num_signals` channels, built once per process and reused for every file."""
+    if num_signals not in figure_templates:
+        fig, axes = plt.subplots(num_signals, 1, figsize=(15, 2 * num_signals), squeeze=False)
+        axes = axes[:, 0]
+        lines = []
+        for ax in axes:
+            lines.append(ax.plot([], [], linewidth=1)[0])
+            ax.set_xlabel('Time (seconds)')
+            ax.grid()
+        figure_templates[num_signals] = {"fig": fig, "axes": axes, "lines": lines, "columns": None}
+    return figure_templates[num_signals]
+
+def plot_signals(file_path, timer=None):
+    timer = timer or StageTimer()
     try:
-        # Load the data from the specified file path
-        data = pd.read_csv(file_path, sep='\t')
+        # Load the data from the specified file path, through the sidecar in 'saved data' when there is one
+        data = load_recording(file_path, cache_dir=saved_data_directory)
     except Exception as e:
         print(f"Error reading {file_path}: {e}")
-        return
+        return None
+    timer.lap("load")
     # Extract the number from the filename to use in the title
     file_name = os.path.basename(file_path)
     match = re.search(r'_(\d+)\.txt$', file_name)  # Change regex according to your file naming convention
     number = file_name.split('_')[-1]#match.group(1) if match else "Unknown"
 
     # Plot each signal in a separate subplot
-    num_signals = data.shape[1] - 1  # Exclude the 'Epoch Time' column
-    plt.figure(figsize=(15, 2 * num_signals))
-    
-    duration = data['Epoch Time'].iloc[-1] - data['Epoch Time'].iloc[0]  # Compute duration based on timestamps
-    for i in range(num_signals):
-        plt.subplot(num_signals, 1, i + 1)
-        # Normalize time for the plot between 0 and duration
-        normalized_time = data['Epoch Time'] - data['Epoch Time'].iloc[0]
-        plt.plot(normalized_time, data.iloc[:, i], label=data.columns[i], linewidth=1)
-        plt.xlim(0, duration)  # Set x-axis limits from 0 to duration
-        plt.xlabel('Time (seconds)')
-        plt.ylabel(data.columns[i])
-        plt.title(f'Signal: {data.columns[i]}')
-        plt.title(f'Signal {i+1} from Participant: {number}')  # Add title with file number
-        plt.grid()
-        plt.legend()
+    columns = data.channels  # Excludes the 'Epoch Time' column
+    num_signals = len(columns)
+    template = figure_template(num_signals)
+    fig, axes, lines = template["fig"], template["axes"], template["lines"]
+    for i, ax in enumerate(axes):
+        ax.set_ylabel(columns[i])
+        ax.set_title(f'Signal {i+1} from Participant: {number}')  # Add title with file number
+        lines[i].set_label(columns[i])
+    if template["columns"] != columns:
+        fig.tight_layout()  # only when the labels change, the layout is reused otherwise
+        template["columns"] = columns
+
+    # Normalize time for the plot between 0 and duration, once for every channel
+    epoch = data['Epoch Time']
+    normalized_time = epoch - epoch[0]
+    duration = normalized_time[-1]  # Compute duration based on timestamps
+    for i, (ax, line) in enumerate(zip(axes, lines)):
+        values = data[columns[i]]
+        if fast_plots:
+            # A min and a max per half pixel column draws the same picture as every sample
+            pixels = int(fig.get_figwidth() * fig.dpi * ax.get_position().width)
+            idx = minmax_indices(values, 4 * pixels)
+            line.set_data(normalized_time[idx], values[idx])
+        else:
+            line.set_data(normalized_time, values)
+        ax.set_xlim(0, duration)  # Set x-axis limits from 0 to duration
+        ax.relim()
+        ax.autoscale_view(scalex=False)
+        ax.legend()
+    timer.lap("plot")
 
     # Save the plot to the 'saved plots' directory
     plot_filename = os.path.join(saved_plots_directory, f'{os.path.basename(file_path).replace(".txt", "")}.png')
-    
+
     # Step 2: Save the plot to a file
     plot_path = plot_filename # Ensure this path is writable
-    plt.tight_layout()
-    plt.savefig(plot_filename)
-    plt.close()  # Close the plot to free up memory
+    fig.savefig(plot_filename)  # The figure stays open for the next file
+    timer.lap("savefig")
     print(f"Plot saved: {plot_filename}")
 
-    # Step 3: Print the plot using CUPS
-    def print_image(image_path, printer_name):
-        # Connect to CUPS
-        conn = cups.Connection()
-        
-        # Check available printers
-        printers = conn.getPrinters()
-        for index, (name, details) in enumerate(printers.items()):
-            print(f"{index}: {name} - {details}")
-
-        if printer_name not in printers.keys():
-            print(f"Printer {printer_name} not found.")
-            return
+    return plot_path
 
-        # Print the image
-        print_job_id = conn.printFile(printer_name, image_path, "Sine Wave Plot", {})
-        print(f"Print job sent with ID: {print_job_id}")
+def report_artifacts(file_path, plot_path, digest=None):
+    report_path = os.path.splitext(plot_path)[0] + '.json'
+    report = write_report(file_path, load_recording(file_path, cache_dir=saved_data_directory), report_path,
+                          digest=digest)
+    spikes = sum(channel["spikes"] for channel in report["channels"].values())
+    flat = sum(channel["flat_runs"] for channel in report["channels"].values())
+    print(f"Artifact report saved: {report_path} ({spikes} spikes, {flat} flat runs)")
 
-    # Define the printer name (check if it matches exactly with the output above)
-    printer_name = 'Canon_TR8600_series'  # Replace with your configured printer's name
+def render_file(file_path):
+    """Pool task: the plot path, the worker's stage timings and the file's content hash."""
+    timer = StageTimer()
+    plot_path = plot_signals(file_path, timer)
+    try:
+        digest = content_hash(file_path)
+    except OSError:
+        digest = None
+    timer.lap("hash")
+    if plot_path and analyze_artifacts:
+        try:
+            report_artifacts(file_path, plot_path, digest)
+        except Exception as e:
+            print(f"Error analyzing {file_path}: {e}")
+        timer.lap("analyze")
+    return plot_path, timer.stages, digest
+
+def start_print_queue(ledger=None):
+    backend = SpoolBackend(print_spool_directory) if print_spool_directory else CupsBackend(printer_name)
+
+    def print_done(plot_paths, ok, stages, attempts):
+        if ledger:
+            ledger.print_done(plot_paths, ok)
+        trace_print(plot_paths, ok, stages, attempts)
+
+    return PrintQueue(backend, max_jobs=max_queued_prints, batch_size=print_batch_size, on_done=print_done).start()
+
+def finish_file(file_path, plot_path, printer, timer=None, ledger=None):
+    """Queue the rendered plot for printing and archive the data file, back in the monitor process.
+
+    Each step is recorded in `ledger` before it is taken, so after a crash the plot is not
+    printed a second time and only the move is left."""
+    timer = timer or StageTimer()
+    filename = os.path.basename(file_path)
+    # Step 3: Hand the plot to the print worker
+    if plot_path:
+        if ledger:
+            ledger.advance(filename, "printing", print_status="queued")
+        if not printer.submit(plot_path) and ledger:
+            ledger.advance(filename, print_status="dropped")
+    timer.lap("print")
 
-    print_image(plot_path, printer_name)
+    # Move processed file to the 'saved data' directory, its columnar sidecar is already there
+    # The raw text is only dropped once a sidecar built from this very file holds its data
+    st = os.stat(file_path)
+    if keep_raw_text or read_cache(cache_path(filename, saved_data_directory), st.st_size, st.st_mtime_ns) is None:
+        shutil.move(file_path, os.path.join(saved_data_directory, filename))
+        print(f"Moved file to: {saved_data_directory}")
+    else:
+        os.remove(file_path)
+        print(f"Archived {filename} as {cache_path(filename, saved_data_directory)}")
+    if ledger:
+        ledger.advance(filename, "moved")
+    timer.lap("move")
 
-def monitor_directory():
+def trace_file(file_path, times, stages, ok, error=None):
+    """Append the stage timings of one file to trace_log."""
+    if not trace_log:
+        return
+    now = time.monotonic()
+    record = {
+        "file": os.path.basename(file_path),
+        "bytes": times["bytes"],
+        "started": time.time() - (now - times["detected"]),
+        "finished": time.time(),
+        "ok": ok,
+        "error": error,
+        "stages": {"ready": times["ready"] - times["detected"], "queue": times["submitted"] - times["ready"],
+                   **stages},
+        "total": now - times["detected"],
+    }
+    try:
+        write_record(trace_log, record)
+    except OSError as e:
+        print(f"Error writing trace: {e}")
+
+def trace_print(plot_paths, ok, stages, attempts):
+    """Append the queue wait and send time of one print job to trace_log, from the print worker."""
+    if not trace_log:
+        return
+    record = {
+        "kind": "print",
+        "plots": [os.path.basename(path) for path in plot_paths],
+        "started": time.time() - sum(stages.values()),
+        "finished": time.time(),
+        "ok": ok,
+        "attempts": attempts,
+        "stages": stages,
+    }
+    try:
+        write_record(trace_log, record)
+    except OSError as e:
+        print(f"Error writing trace: {e}")
+
+def monitor_directory(tick=0.5, rescan_interval=30, workers=None, max_queued=None):
     print("Monitoring directory for new files...")
     print(f"Looking in: {directory_to_monitor} for .txt files.")
+    workers = workers or plot_workers
+    max_queued = max_queued or max_queued_plots
+    pool = ProcessPoolExecutor(max_workers=workers)
+    ledger = IngestLedger(ledger_path)
+    printer = start_print_queue(ledger)
+    # Plots that were queued for printing when the last run stopped
+    for name, plot_path in ledger.unprinted():
+        if os.path.exists(plot_path):
+            print(f"Printing {os.path.basename(plot_path)} left over from the last run")
+            printer.submit(plot_path)
+        else:
+            ledger.advance(name, print_status="failed")
+    in_flight = {}  # future -> file path
+    waiting = deque()  # settled files not yet handed to the pool
+    busy = set()  # paths waiting or in flight, ignored by the watcher until finished
+    times = {}  # path -> monotonic times (and size) for the trace
+    crashes = {}  # path -> times a worker died while it was in flight
+    tracker = ReadinessTracker()
+    try:
+        watch = DirectoryWatch(directory_to_monitor)
+    except OSError as e:
+        watch = None
+        rescan_interval = tick
+        print(f"inotify unavailable ({e}), rescanning every {tick}s")
+
+    def track(filename, closed=False):
+        if filename.endswith('.txt'):
+            file_path = os.path.join(directory_to_monitor, filename)
+            if file_path in busy:
+                return
+            entry = ledger.entry(file_path)
+            if entry is not None and entry["stage"] in ("moved", "failed"):
+                return  # this very file was processed (or given up on) before
+            if file_path not in tracker.pending:
+                print(f"Detected new file: {filename}")
+                times.setdefault(file_path, {"detected": time.monotonic()})
+            tracker.observe(file_path, closed)
+
+    def restart_pool():
+        """Replace a pool broken by a dying worker (OOM kill, segfault), returning the files it took down."""
+        nonlocal pool
+        print("A render worker died, starting a new pool")
+        pool.shutdown(wait=False, cancel_futures=True)
+        pool = ProcessPoolExecutor(max_workers=workers)
+        lost = [future for future in in_flight if future.cancelled() or not future.done()
+                or isinstance(future.exception(), BrokenProcessPool)]
+        return [in_flight.pop(future) for future in lost]
+
+    def requeue(paths, crashed=True):
+        """Send files back through the readiness check, unless they keep coming back with a dead worker."""
+        for file_path in paths:
+            busy.discard(file_path)
+            times.pop(file_path, None)
+            if crashed:
+                crashes[file_path] = crashes.get(file_path, 0) + 1
+                if crashes[file_path] >= max_pool_crashes:
+                    print(f"Giving up on {file_path}: a render worker died {crashes[file_path]} times with it")
+                    ledger.advance(os.path.basename(file_path), "failed")
+                    continue
+            track(os.path.basename(file_path))
+
+    last_scan = 0
     while True:
         try:
-            # List all files in the specified directory
-            files_in_directory = os.listdir(directory_to_monitor)
-
-            for filename in files_in_directory:
-                file_path = os.path.join(directory_to_monitor, filename)
-                
-                # Check if the file has already been processed
-                if filename.endswith('.txt') and filename not in processed_files:
-                    print(f"Detected new file: {filename}")
-                    
-                    # Wait until the file is fully uploaded
-                    if is_file_ready(file_path):
-                        print(f"Processing new file: {filename}")
-                        plot_signals(file_path)
-                        processed_files.add(filename)
-                        
-                        # Move processed file to the 'saved data' directory
-                        shutil.move(file_path, os.path.join(saved_data_directory, filename))
-                        print(f"Moved file to: {saved_data_directory}")
+            if watch is not None:
+                for mask, filename in watch.read_events(timeout=tick):
+                    if mask & (IN_DELETE | IN_MOVED_FROM):
+                        tracker.discard(os.path.join(directory_to_monitor, filename))
                     else:
-                        print(f"File {filename} is still being uploaded.")
+                        track(filename, closed=bool(mask & IN_CLOSE_WRITE))
+            else:
+                time.sleep(tick)
+
+            # Full listing as a safety net for missed events, or as the only source without inotify
+            if time.monotonic() - last_scan >= rescan_interval:
+                for filename in os.listdir(directory_to_monitor):
+                    track(filename)
+                last_scan = time.monotonic()
 
-            print("Waiting for new files...")  # Indicate it's actively running
+            # Uploads are checked side by side, so one slow file never holds up the others
+            for file_path in tracker.ready():
+                waiting.append(file_path)
+                busy.add(file_path)
+                times.setdefault(file_path, {"detected": time.monotonic()})["ready"] = time.monotonic()
+            while waiting and len(in_flight) < max_queued:
+                file_path = waiting.popleft()
+                entry = ledger.entry(file_path)
+                if entry is not None and entry["stage"] == "printing":
+                    # Rendered and handed to the printer before a restart, only the move is left
+                    print(f"Resuming {os.path.basename(file_path)}: already printed, archiving")
+                    busy.discard(file_path)
+                    times.pop(file_path, None)
+                    finish_file(file_path, None, printer, ledger=ledger)
+                    continue
+                try:
+                    ledger.start(file_path)
+                except FileNotFoundError:
+                    busy.discard(file_path)
+                    times.pop(file_path, None)
+                    continue  # removed while it waited
+                print(f"Processing new file: {os.path.basename(file_path)}")
+                file_times = times[file_path]
+                file_times["submitted"] = time.monotonic()
+                try:
+                    file_times["bytes"] = os.path.getsize(file_path)
+                except OSError:
+                    file_times["bytes"] = 0
+                try:
+                    in_flight[pool.submit(render_file, file_path)] = file_path
+                except BrokenProcessPool:
+                    requeue(restart_pool())
+                    requeue([file_path], crashed=False)
+
+            finished = [future for future in in_flight if future.done()]
+            for future in finished:
+                if future not in in_flight:
+                    continue  # requeued when the pool broke
+                if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                    requeue(restart_pool())
+                    continue
+                file_path = in_flight.pop(future)
+                crashes.pop(file_path, None)
+                busy.discard(file_path)
+                file_times = times.pop(file_path)
+                try:
+                    plot_path, stages, digest = future.result()
+                except Exception as e:
+                    print(f"Error plotting {file_path}: {e}")
+                    trace_file(file_path, file_times, {}, False, str(e))
+                    continue  # left in place, retried on the next rescan
+                # Waiting for a free worker plus noticing the result, beyond the worker's own stages
+                stages["pool"] = time.monotonic() - file_times["submitted"] - sum(stages.values())
+                timer = StageTimer()
+                error = None if plot_path else "could not read the file"
+                try:
+                    ledger.advance(os.path.basename(file_path), "rendered", hash=digest, plot=plot_path)
+                    finish_file(file_path, plot_path, printer, timer, ledger)
+                except Exception as e:
+                    error = str(e)
+                    raise
+                finally:
+                    stages.update(timer.stages)
+                    trace_file(file_path, file_times, stages, error is None, error)
+            if finished and not in_flight and not waiting:
+                print("Waiting for new files...")  # Indicate it's actively running
 
         except Exception as e:
             print(f"Error in monitoring directory: {e}")
-
-        time.sleep(5)  # Check for new files every 5 seconds
+            time.sleep(tick)
 
 if __name__ == "__main__":
     monitor_directory()
\ No newline at end of file
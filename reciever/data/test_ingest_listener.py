@@ -0,0 +1,89 @@
+import os
+import socket
+import sys
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from ingest_listener import IngestListener
+from stream_store import StreamTailer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "transmitter"))
+from realtime_signal_gen import SocketWriter  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class IngestRoundTrip(unittest.TestCase):
+    """Transmitter SocketWriter -> IngestListener -> StreamTailer on localhost."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.port = free_port()
+        self.tailer = StreamTailer(capacity=100_000)
+        self.listener = self.listen()
+
+    def tearDown(self):
+        self.listener.close()
+
+    def listen(self):
+        return IngestListener(self.tailer, self.folder, host="127.0.0.1", port=self.port).start()
+
+    def received(self, name, count, writer=None, timeout=5):
+        """Samples of `name` once `count` have arrived, retrying a pending TCP backlog meanwhile."""
+        path = os.path.join(self.folder, name)
+        deadline = time.monotonic() + timeout
+        while self.tailer.count(path) < count and time.monotonic() < deadline:
+            if writer is not None and writer.backlog:
+                writer._send()
+            time.sleep(0.02)
+        return self.tailer.read(path, refresh=False)[1]
+
+    def test_tcp_survives_listener_restart(self):
+        writer = SocketWriter(f"tcp://127.0.0.1:{self.port}", "sinewave_tcp.txt", 30, retry=0.05)
+        sent = np.arange(300, dtype=np.float32)
+        for batch in np.split(sent[:100], 10):
+            writer.add(batch)
+            writer.flush()
+        self.assertEqual(len(self.received("sinewave_tcp.txt", 100)), 100)
+
+        self.listener.close()
+        for batch in np.split(sent[100:200], 10):  # the first of these may vanish into the closed socket
+            writer.add(batch)
+            writer.flush()
+            time.sleep(0.01)
+        self.listener = self.listen()
+        for batch in np.split(sent[200:], 10):
+            writer.add(batch)
+            writer.flush()
+        values = self.received("sinewave_tcp.txt", 300, writer)
+        writer.close()
+        np.testing.assert_array_equal(values, sent)  # nothing lost, nothing twice
+
+    def test_udp_batch_larger_than_8_kib(self):
+        writer = SocketWriter(f"udp://127.0.0.1:{self.port}", "sinewave_udp.txt", 1000)
+        sent = np.arange(3000, dtype=np.float32)  # 12 kB of samples in one datagram
+        writer.add(sent)
+        writer.flush()
+        values = self.received("sinewave_udp.txt", 3000)
+        writer.close()
+        np.testing.assert_array_equal(values, sent)
+
+    def test_udp_splits_batches_beyond_one_datagram(self):
+        writer = SocketWriter(f"udp://127.0.0.1:{self.port}", "sinewave_big.txt", 1000)
+        sent = np.arange(40_000, dtype=np.float32)
+        writer.add(sent)
+        writer.flush()
+        values = self.received("sinewave_big.txt", len(sent))
+        writer.close()
+        np.testing.assert_array_equal(values, sent)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import struct
+
+import numpy as np
+
+# Binary sample batch, all little-endian:
+#   magic "SWF1" | dtype (4 = float32, 8 = float64) | reserved | filename length (uint16)
+#   start index (uint64) | cursor (uint64) | count (uint32) | filename (utf-8)
+#   zero padding to a multiple of 8 bytes | count samples
+# The padding lets the browser view the payload directly as a Float32Array/Float64Array.
+MAGIC = b"SWF1"
+MIMETYPE = "application/octet-stream"
+HEADER = struct.Struct("<4sBBHQQI")
+DTYPES = {"f32": np.dtype("<f4"), "f64": np.dtype("<f8")}
+
+
+def encode_batch(filename, start, cursor, values, dtype="f32"):
+    samples = np.asarray(values, dtype=DTYPES[dtype])
+    name = filename.encode("utf-8")
+    header = HEADER.pack(MAGIC, samples.itemsize, 0, len(name), start, cursor, len(samples)) + name
+    header += b"\0" * (-len(header) % 8)
+    return header + samples.tobytes()
+
+
+def decode_batch(payload):
+    """Inverse of encode_batch, returns (filename, start, cursor, values)."""
+    magic, size, _, name_len, start, cursor, count = HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise ValueError("Not a sample batch")
+    name_end = HEADER.size + name_len
+    filename = payload[HEADER.size:name_end].decode("utf-8")
+    offset = name_end + (-name_end % 8)
+    samples = np.frombuffer(payload, dtype=DTYPES["f32" if size == 4 else "f64"], count=count, offset=offset)
+    return filename, start, cursor, samples
@@ -0,0 +1,122 @@
+import numpy as np
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from realtime_signal_gen import BatchedWriter, BinaryWriter, BINARY_DTYPES, BINARY_HEADER_SIZE, SineSource, run, sample_rate
+
+# Many realtime_signal_gen.py transmitters in one process, one thread each, writing
+# sinewave_<id>.txt (or .bin) into a local folder that app.py / realtime_stream.py watch.
+
+def transmit(filepath, args, stop, result):
+    """One simulated user; fills `result` with what it wrote and how late its wakeups were."""
+    binary = args.format == "binary"
+    jitter = []
+    with open(filepath, BinaryWriter.mode if binary else BatchedWriter.mode) as f:
+        if binary:
+            writer = BinaryWriter(f, args.sample_rate, args.dtype, fsync=not args.no_fsync)
+        else:
+            writer = BatchedWriter(f, fsync=not args.no_fsync)
+        written, elapsed = run(writer, SineSource(args.sample_rate), args.sample_rate,
+                               args.flush_every, args.flush_ms, stop, jitter)
+    result.update(written=written, elapsed=elapsed, jitter=jitter)
+
+def count_samples(filepath, binary, dtype):
+    """Samples that actually reached the file, independent of what the writer counted."""
+    if binary:
+        return (os.path.getsize(filepath) - BINARY_HEADER_SIZE) // np.dtype(BINARY_DTYPES[dtype][1]).itemsize
+    with open(filepath, "rb") as f:
+        return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+
+def percentiles(values):
+    if not values:
+        return {}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99]) * 1000
+    return {"p50_ms": round(p50, 3), "p90_ms": round(p90, 3), "p99_ms": round(p99, 3),
+            "max_ms": round(max(values) * 1000, 3)}
+
+def simulate(args):
+    os.makedirs(args.output, exist_ok=True)
+    suffix = BinaryWriter.suffix if args.format == "binary" else BatchedWriter.suffix
+    stop = threading.Event()
+    users = []
+    for i in range(args.users):
+        filepath = os.path.join(args.output, f"sinewave_{args.prefix}{i}{suffix}")
+        if os.path.exists(filepath):
+            os.remove(filepath)  # counts below assume a fresh file
+        result = {}
+        thread = threading.Thread(target=transmit, args=(filepath, args, stop, result), daemon=True)
+        users.append((filepath, thread, result))
+
+    print(f"Starting {args.users} transmitters at {args.sample_rate} Hz into {args.output} ...", file=sys.stderr)
+    for _, thread, _ in users:
+        thread.start()
+        if args.stagger:
+            time.sleep(1 / args.sample_rate / args.users)  # spread the writers over one sample period
+    try:
+        stop.wait(args.duration)
+    except KeyboardInterrupt:
+        print("\nStopped by user.", file=sys.stderr)
+    stop.set()
+    for _, thread, _ in users:
+        thread.join()
+
+    per_user = []
+    all_jitter = []
+    for filepath, _, result in users:
+        on_disk = count_samples(filepath, args.format == "binary", args.dtype)
+        expected = result["elapsed"] * args.sample_rate
+        all_jitter.extend(result["jitter"])
+        per_user.append({"file": os.path.basename(filepath), "written": result["written"], "on_disk": on_disk,
+                         "elapsed": round(result["elapsed"], 3),
+                         "rate": round(result["written"] / result["elapsed"], 3) if result["elapsed"] else 0.0,
+                         "behind": round(expected - result["written"], 1), "jitter": percentiles(result["jitter"])})
+    written = sum(user["written"] for user in per_user)
+    return {
+        "users": args.users, "sample_rate": args.sample_rate, "format": args.format,
+        "flush_every": args.flush_every, "flush_ms": args.flush_ms, "fsync": not args.no_fsync,
+        "duration": args.duration, "written": written, "on_disk": sum(user["on_disk"] for user in per_user),
+        "aggregate_rate": round(written / max(user["elapsed"] for user in per_user), 3) if per_user else 0.0,
+        "wakeups": len(all_jitter), "jitter": percentiles(all_jitter), "per_user": per_user,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate many transmitters writing live sinewaves at once.")
+    parser.add_argument("--users", type=int, default=10, help="number of simulated transmitters")
+    parser.add_argument("--output", default="Plots", help="folder to write into, e.g. the one app.py watches")
+    parser.add_argument("--prefix", default="load", help="user IDs are <prefix>0 .. <prefix>N-1")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run, Ctrl+C stops early")
+    parser.add_argument("--stagger", action="store_true", help="start the writers spread over one sample period")
+    parser.add_argument("--sample-rate", type=int, default=sample_rate, help="samples per second per user")
+    parser.add_argument("--flush-every", type=int, help="flush after this many samples (default 1 unless --flush-ms)")
+    parser.add_argument("--flush-ms", type=float, help="flush at least this often, in milliseconds")
+    parser.add_argument("--no-fsync", action="store_true", help="flush Python buffers only, skip os.fsync")
+    parser.add_argument("--format", choices=["text", "binary"], default="text")
+    parser.add_argument("--dtype", choices=sorted(BINARY_DTYPES), default="f32", help="sample type for --format binary")
+    parser.add_argument("--json", help="also write the summary to this file")
+    args = parser.parse_args(argv)
+    if args.flush_every is None and args.flush_ms is None:
+        args.flush_every = 1
+    if args.sample_rate < 1:
+        parser.error("--sample-rate must be at least 1")
+    if args.flush_every is not None and args.flush_every < 0:
+        parser.error("--flush-every must not be negative")
+    if args.flush_ms is not None and not args.flush_ms > 0:
+        parser.error("--flush-ms must be positive")
+    if not args.flush_every and not args.flush_ms:
+        parser.error("--flush-every 0 needs --flush-ms, or nothing would ever be flushed")
+    return args
+
+def main():
+    args = parse_args()
+    summary = simulate(args)
+    text = json.dumps(summary, indent=1)
+    if args.json:
+        with open(args.json, "w") as f:
+            f.write(text)
+    print(text)
+
+if __name__ == "__main__":
+    main()
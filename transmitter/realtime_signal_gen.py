@@ -3,35 +3,308 @@ import time
 import random
 import os
 import sys
+import argparse
+import struct
+import socket
+from collections import deque
+from urllib.parse import urlsplit
 
 # Set path to shared folder (adjust as needed)
 network_share_path = r"/run/user/1000/gvfs/smb-share:server=192.168.20.29,share=data/real time/data"
-os.makedirs(network_share_path, exist_ok=True)
-
-user_id = input("Enter your user ID: ").strip()
-filename = f"sinewave_{user_id}.txt"
-filepath = os.path.join(network_share_path, filename)
 
 sample_rate = 30  # samples per second
 
 def generate_sinewave(freq, amplitude, t):
     return amplitude * np.sin(2 * np.pi * freq * t)
 
-def main():
-    print(f"Writing sinewave to {filepath} ... (Press Ctrl+C to stop)")
-    try:
-        with open(filepath, "a") as f:
-            while True:
+class SineSource:
+    """Sinewave whose frequency and amplitude change every second, handed out in arbitrary batches."""
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.segment = np.empty(0)
+        self.pos = 0
+
+    def take(self, n):
+        parts = []
+        while n > 0:
+            if self.pos >= len(self.segment):
                 freq = random.uniform(0.5, 5.0)
                 amplitude = random.uniform(0.5, 2.0)
-                t = np.linspace(0, 1, sample_rate, endpoint=False)
-                signal = generate_sinewave(freq, amplitude, t)
-
-                for val in signal:
-                    f.write(f"{val:.5f}\n")
-                    f.flush()          # Flush Python buffer
-                    os.fsync(f.fileno())  # Flush OS buffer
-                    time.sleep(1 / sample_rate)
+                t = np.linspace(0, 1, self.sample_rate, endpoint=False)
+                self.segment = generate_sinewave(freq, amplitude, t)
+                self.pos = 0
+            part = self.segment[self.pos:self.pos + n]
+            parts.append(part)
+            self.pos += len(part)
+            n -= len(part)
+        return np.concatenate(parts) if parts else np.empty(0)
+
+class BatchedWriter:
+    """Collects samples and writes, flushes and optionally fsyncs them as one batch."""
+
+    mode = "a"
+    suffix = ".txt"
+
+    def __init__(self, f, fsync=True):
+        self.f = f
+        self.fsync = fsync
+        self.pending = 0
+        self._chunks = []
+
+    def encode(self, values):
+        return "".join(f"{val:.5f}\n" for val in values)
+
+    def add(self, values):
+        self._chunks.append(self.encode(values))
+        self.pending += len(values)
+
+    def flush(self):
+        self.f.write(self._chunks[0][:0].join(self._chunks))
+        self.f.flush()                # Flush Python buffer
+        if self.fsync:
+            os.fsync(self.f.fileno())  # Flush OS buffer
+        self._chunks = []
+        self.pending = 0
+
+# Binary stream file, read by reciever/data/binary_stream.py. Little-endian header:
+#   magic "SWB1" | version (uint16) | header size (uint16) | channels (uint16) | dtype ('f' or 'd') | pad
+#   sample rate (float64) | zero padding up to the header size
+# followed by fixed-size records of `channels` samples each.
+BINARY_HEADER = struct.Struct("<4sHHHcxd")
+BINARY_HEADER_SIZE = 32
+BINARY_DTYPES = {"f32": (b"f", "<f4"), "f64": (b"d", "<f8")}
+
+class BinaryWriter(BatchedWriter):
+    """Appends fixed-size float records instead of text lines, no formatting on the hot path."""
+
+    mode = "ab"
+    suffix = ".bin"
+
+    def __init__(self, f, sample_rate, dtype="f32", fsync=True):
+        super().__init__(f, fsync)
+        code, self.dtype = BINARY_DTYPES[dtype]
+        header = BINARY_HEADER.pack(b"SWB1", 1, BINARY_HEADER_SIZE, 1, code, sample_rate)
+        header += b"\0" * (BINARY_HEADER_SIZE - len(header))
+        if f.tell() == 0:
+            f.write(header)
+            f.flush()
+        else:
+            with open(f.name, "rb") as existing:
+                if existing.read(BINARY_HEADER_SIZE) != header:
+                    raise ValueError(f"{f.name} was written with a different sample rate or dtype")
+
+    def encode(self, values):
+        return np.asarray(values, dtype=self.dtype).tobytes()
+
+# Sample batch sent with --send, the wire format of reciever/data/wire_format.py, little-endian:
+#   magic "SWF1" | dtype (4 = float32) | reserved | filename length (uint16)
+#   start index (uint64) | session (uint64, in place of the cursor) | count (uint32)
+#   filename | zero padding to 8 bytes | samples
+# Over TCP every frame is preceded by its length (uint32); over UDP every datagram is one frame.
+WIRE_HEADER = struct.Struct("<4sBBHQQI")
+FRAME_LENGTH = struct.Struct("<I")
+MAX_DATAGRAM = 65507  # bytes, the largest UDP payload over IPv4; bigger batches are split
+
+def encode_frame(filename, session, start, values):
+    samples = np.asarray(values, dtype="<f4")
+    name = filename.encode("utf-8")
+    header = WIRE_HEADER.pack(b"SWF1", samples.itemsize, 0, len(name), start, session, len(samples)) + name
+    header += b"\0" * (-len(header) % 8)
+    return header + samples.tobytes()
+
+class SocketWriter(BatchedWriter):
+    """Sends each batch to the receiver's ingest listener (reciever/data/ingest_listener.py)
+    instead of writing it to the share. `url` is tcp://host:port or udp://host:port.
+
+    Over TCP, batches are kept while the link is down, up to `buffer_seconds` of samples at
+    `sample_rate` with the oldest dropped first, and sent once a reconnect (tried every
+    `retry` seconds) succeeds, together with the last `resend_seconds` sent before the drop,
+    which the kernel may have accepted without them arriving. Every frame carries the index
+    of its first sample, so the receiver drops what it already got, and a session number
+    telling it the transmitter was restarted. Over UDP a lost datagram stays lost.
+    """
+
+    def __init__(self, url, filename, sample_rate, buffer_seconds=10 * 60, resend_seconds=5,
+                 timeout=2.0, retry=1.0):
+        super().__init__(None, fsync=False)
+        parts = urlsplit(url)
+        if parts.scheme not in ("tcp", "udp") or not parts.hostname or not parts.port:
+            raise ValueError(f"Expected tcp://host:port or udp://host:port, got {url}")
+        self.tcp = parts.scheme == "tcp"
+        self.address = (parts.hostname, parts.port)
+        self.filename = filename
+        self.max_buffered = int(buffer_seconds * sample_rate)  # samples
+        self.resend = int(resend_seconds * sample_rate)
+        self.timeout = timeout
+        self.retry = retry
+        self.session = time.time_ns()
+        self.sent = 0  # sender index of the next sample
+        self.backlog = deque()  # (start, values) not yet sent over TCP
+        self.buffered = 0
+        self.recent = deque()  # (start, values) sent lately, resent after a drop
+        self.sock = None
+        self.next_attempt = 0
+        if not self.tcp:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            # float32 samples that fit in one datagram next to the header and file name
+            self.datagram_samples = (MAX_DATAGRAM - len(encode_frame(filename, 0, 0, []))) // 4
+
+    def encode(self, values):
+        return np.asarray(values, dtype="<f4")
+
+    def flush(self):
+        values = np.concatenate(self._chunks)
+        self._chunks = []
+        self.pending = 0
+        start, self.sent = self.sent, self.sent + len(values)
+        if not self.tcp:
+            for i in range(0, len(values), self.datagram_samples):
+                batch = values[i:i + self.datagram_samples]
+                frame = encode_frame(self.filename, self.session, start + i, batch)
+                try:
+                    self.sock.sendto(frame, self.address)
+                except OSError as e:
+                    print(f"Send failed: {e}")
+            return
+        self.backlog.append((start, values))
+        self.buffered += len(values)
+        while self.buffered > self.max_buffered:
+            _, dropped = self.backlog.popleft()
+            self.buffered -= len(dropped)
+        self._send()
+
+    def _connect(self):
+        if time.monotonic() < self.next_attempt:
+            return None
+        try:
+            self.sock = socket.create_connection(self.address, timeout=self.timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            print(f"Connected to {self.address[0]}:{self.address[1]}")
+        except OSError:
+            self.next_attempt = time.monotonic() + self.retry
+        return self.sock
+
+    def _send(self):
+        if self.sock is None and self._connect() is None:
+            return
+        try:
+            while self.backlog:
+                start, values = self.backlog[0]
+                frame = encode_frame(self.filename, self.session, start, values)
+                self.sock.sendall(FRAME_LENGTH.pack(len(frame)) + frame)
+                self.recent.append(self.backlog.popleft())
+                while sum(len(v) for _, v in self.recent) - len(self.recent[0][1]) >= self.resend:
+                    self.recent.popleft()
+                self.buffered -= len(values)
+        except OSError as e:
+            # A frame that was partly sent goes again in full, the receiver skips what it has
+            print(f"Connection lost ({e}), buffering until it is back")
+            self.buffered += sum(len(v) for _, v in self.recent)
+            self.backlog.extendleft(reversed(self.recent))
+            self.recent.clear()
+            self.close()
+            self.next_attempt = time.monotonic() + self.retry
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+def run(writer, source, sample_rate, flush_every=1, flush_ms=None, stop=None, jitter=None):
+    """Write samples at exactly `sample_rate`, flushing every `flush_every` samples and/or every `flush_ms` ms.
+
+    Sample i is due at start + i / sample_rate on the monotonic clock, so a late wakeup
+    writes every sample that has come due instead of drifting. Runs until `stop` is set
+    (or forever) and returns the number of samples written and the elapsed time. If
+    `jitter` is a list, how late each wakeup was (in seconds) is appended to it.
+    """
+    start = time.monotonic()
+    last_flush = start
+    written = 0
+    try:
+        while True:
+            now = time.monotonic()
+            due = int((now - start) * sample_rate) + 1  # samples whose time has come
+            if due > written:
+                writer.add(source.take(due - written))
+                written = due
+            if writer.pending and ((flush_every and writer.pending >= flush_every) or
+                                   (flush_ms and (now - last_flush) * 1000 >= flush_ms)):
+                writer.flush()
+                last_flush = now
+            if stop is not None and stop.is_set():
+                break
+
+            # Sleep until the next flush is due
+            wake = []
+            if flush_every:
+                wake.append(start + (written + flush_every - writer.pending - 1) / sample_rate)
+            if flush_ms:
+                wake.append(last_flush + flush_ms / 1000)
+            delay = min(wake) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+                if jitter is not None:
+                    jitter.append(time.monotonic() - min(wake))
+    finally:
+        if writer.pending:
+            writer.flush()
+    return written, time.monotonic() - start
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Append a live sinewave to the shared folder.")
+    parser.add_argument("--user", help="user ID, prompted for if omitted")
+    parser.add_argument("--sample-rate", type=int, default=sample_rate, help="samples per second")
+    parser.add_argument("--flush-every", type=int, help="flush after this many samples (default 1 unless --flush-ms)")
+    parser.add_argument("--flush-ms", type=float, help="flush at least this often, in milliseconds")
+    parser.add_argument("--no-fsync", action="store_true", help="flush Python buffers only, skip os.fsync")
+    parser.add_argument("--format", choices=["text", "binary"], default="text",
+                        help="text lines (sinewave_<id>.txt) or fixed-size binary records (sinewave_<id>.bin)")
+    parser.add_argument("--dtype", choices=sorted(BINARY_DTYPES), default="f32", help="sample type for --format binary")
+    parser.add_argument("--send", metavar="URL",
+                        help="stream to the receiver at tcp://host:port or udp://host:port instead of the shared folder")
+    args = parser.parse_args(argv)
+    if args.send and args.format != "text":
+        parser.error("--send streams samples itself, --format does not apply")
+    if args.flush_every is None and args.flush_ms is None:
+        args.flush_every = 1  # per-sample, as before
+    if args.sample_rate < 1:
+        parser.error("--sample-rate must be at least 1")
+    if args.flush_every is not None and args.flush_every < 0:
+        parser.error("--flush-every must not be negative")
+    if args.flush_ms is not None and not args.flush_ms > 0:
+        parser.error("--flush-ms must be positive")
+    if not args.flush_every and not args.flush_ms:
+        parser.error("--flush-every 0 needs --flush-ms, or nothing would ever be flushed")
+    return args
+
+def main():
+    args = parse_args()
+    user_id = args.user or input("Enter your user ID: ").strip()
+    if args.send:
+        writer = SocketWriter(args.send, f"sinewave_{user_id}.txt", args.sample_rate)
+        print(f"Sending sinewave to {args.send} at {args.sample_rate} Hz ... (Press Ctrl+C to stop)")
+        try:
+            run(writer, SineSource(args.sample_rate), args.sample_rate, args.flush_every, args.flush_ms)
+        except KeyboardInterrupt:
+            print("\nStopped by user.")
+        finally:
+            writer.close()
+        return
+    os.makedirs(network_share_path, exist_ok=True)
+    binary = args.format == "binary"
+    writer_class = BinaryWriter if binary else BatchedWriter
+    filepath = os.path.join(network_share_path, f"sinewave_{user_id}{writer_class.suffix}")
+
+    print(f"Writing sinewave to {filepath} at {args.sample_rate} Hz ... (Press Ctrl+C to stop)")
+    try:
+        with open(filepath, writer_class.mode) as f:
+            if binary:
+                writer = BinaryWriter(f, args.sample_rate, args.dtype, fsync=not args.no_fsync)
+            else:
+                writer = BatchedWriter(f, fsync=not args.no_fsync)
+            run(writer, SineSource(args.sample_rate), args.sample_rate, args.flush_every, args.flush_ms)
     except KeyboardInterrupt:
         print("\nStopped by user.")
         sys.exit(0)
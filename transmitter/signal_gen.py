@@ -0,0 +1,144 @@
+import numpy as np
+import os
+import sys
+import time
+import argparse
+
+# Recordings for the post processing folder: noisy sine waves with spikes and flat zones plus
+# an 'Epoch Time' column, tab separated. Generated and written block by block, so the file
+# size is only limited by the disk.
+
+output_directory = r"/run/user/1000/gvfs/smb-share:server=192.168.20.29,share=data/post processing/new data"
+
+# Function to display a simple progress bar
+def print_progress_bar(iteration, total, length=40):
+    percent = (iteration / total) * 100
+    filled_length = int(length * iteration // total)
+    bar = '█' * filled_length + '-' * (length - filled_length)
+    sys.stdout.write(f'\rProgress: |{bar}| {percent:.2f}% Complete')
+    sys.stdout.flush()
+
+class SignalBlocks:
+    """Random sine waves, one column per channel, handed out as (epoch, samples) blocks."""
+
+    def __init__(self, channels=6, fs=100, seed=None, start_time=None, spike_rate=0.05, flat_rate=0.15):
+        self.rng = np.random.default_rng(seed)
+        self.channels = channels
+        self.fs = fs
+        self.start_time = time.time() if start_time is None else start_time
+        self.spike_rate = spike_rate
+        self.flat_rate = flat_rate
+        self.frequencies = self.rng.uniform(0.1, 2, channels)  # Random frequencies between 0.1 and 2 Hz
+        self.amplitudes = self.rng.uniform(0.5, 1.5, channels)  # Random amplitudes for more variation
+
+    def block(self, start, stop):
+        """Samples [start, stop) as epoch times (n,) and waves (n, channels)."""
+        n = stop - start
+        t = np.arange(start, stop) / self.fs
+        waves = np.sin(2 * np.pi * t[:, None] * self.frequencies) * self.amplitudes
+        waves += self.rng.normal(0, 0.1, (n, self.channels))  # Add slight noise
+        spikes = self.rng.random((n, self.channels)) < self.spike_rate
+        waves[spikes] += self.rng.normal(5, 2, np.count_nonzero(spikes))  # Spikes with a random value
+        waves[self.rng.random((n, self.channels)) < self.flat_rate] = 0  # Flat zones
+        return self.start_time + t, waves
+
+def format_column(values, precision, out, sep):
+    """Write `values` as fixed-point text into the byte matrix `out`, one row per value.
+
+    Digits are computed for the whole column at once. Unused leading positions are
+    left as zero bytes and squeezed out afterwards, which is what lets a block be
+    formatted without a Python-level call per number.
+    """
+    # Whole part and fraction are split before scaling: scaling an epoch time (~1.7e9) as a
+    # whole by 10**6 runs out of float64 precision, the fraction alone is exact
+    magnitude = np.abs(values)
+    whole = np.floor(magnitude)
+    scaled = (magnitude - whole) * 10**precision
+    frac = np.rint(scaled).astype(np.int64)
+    whole = whole.astype(np.int64)
+    # Within rounding error of a tie the product can't tell which way '%f' rounds, ask it
+    for i in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6):
+        text = '%.*f' % (precision, magnitude[i])
+        whole[i], frac[i] = int(text[:-precision - 1]), int(text[-precision:])
+    carry = frac == 10**precision  # rounded up to the next whole number
+    whole[carry] += 1
+    frac[carry] = 0
+    int_digits = out.shape[1] - precision - 3  # sign, decimal point, separator
+    out[:, 0] = np.where((values < 0) & ((whole > 0) | (frac > 0)), ord('-'), 0)
+    frac = frac.astype(np.uint32)
+    for col in range(out.shape[1] - 2, int_digits + 1, -1):
+        frac, digit = np.divmod(frac, 10)
+        out[:, col] = digit + 48
+    out[:, int_digits + 1] = ord('.')
+    for col in range(int_digits, 0, -1):
+        whole, digit = np.divmod(whole, 10)
+        digit = digit.astype(np.uint8) + 48
+        if col < int_digits:
+            digit[(whole == 0) & (digit == 48)] = 0  # leading zero
+        out[:, col] = digit
+    out[:, -1] = ord(sep)
+
+def column_width(values, precision):
+    whole = int(np.abs(values).max()) if len(values) else 0  # +1 below covers rounding up to the next digit
+    return len(str(whole + 1)) + precision + 3
+
+def format_block(epoch, waves, precision=6):
+    """Tab separated rows of `waves` followed by `epoch`, as bytes ('%.6f' style)."""
+    columns = [waves[:, i] for i in range(waves.shape[1])] + [epoch]
+    widths = [column_width(values, precision) for values in columns]
+    out = np.empty((len(epoch), sum(widths)), dtype=np.uint8)
+    pos = 0
+    for i, (values, width) in enumerate(zip(columns, widths)):
+        format_column(values, precision, out[:, pos:pos + width], '\n' if i == len(columns) - 1 else '\t')
+        pos += width
+    out = out.ravel()
+    return out[out != 0].tobytes()
+
+def write_recording(path, source, duration_seconds, block_seconds=60, progress=True):
+    """Write `duration_seconds` of `source` to `path`, returns the number of rows."""
+    total_rows = int(duration_seconds * source.fs)
+    block_rows = max(1, int(block_seconds * source.fs))
+    total_blocks = (total_rows + block_rows - 1) // block_rows
+    columns = [f'Sine Wave {i+1}' for i in range(source.channels)] + ['Epoch Time']
+    with open(path, 'wb') as f:
+        f.write(('\t'.join(columns) + '\n').encode('utf-8'))
+        for i, start in enumerate(range(0, total_rows, block_rows)):
+            epoch, waves = source.block(start, min(start + block_rows, total_rows))
+            f.write(format_block(epoch, waves))
+            if progress:
+                print_progress_bar(i + 1, total_blocks)
+    return total_rows
+
+def parse_args(argv=None, **defaults):
+    parser = argparse.ArgumentParser(description="Write a synthetic recording to the post processing folder.")
+    parser.add_argument("--channels", type=int, default=6, help="number of sine wave columns")
+    parser.add_argument("--fs", type=float, default=100, help="sampling frequency in Hz")
+    parser.add_argument("--duration", type=float, default=60, help="duration in minutes")
+    parser.add_argument("--seed", type=int, help="random seed, for reproducible files")
+    parser.add_argument("--user", help="user ID for the file name, prompted for if omitted")
+    parser.add_argument("--output", default=output_directory, help="folder to write sine_waves_<user>.txt to")
+    parser.set_defaults(**defaults)
+    return parser.parse_args(argv)
+
+def main(argv=None, make_dirs=True, **defaults):
+    """Generate one recording; `defaults` override the CLI defaults (duration, output, ...)."""
+    args = parse_args(argv, **defaults)
+    user_id = args.user or input("Please enter your user ID: ").strip()
+    # Sanitize the user ID to avoid issues with file naming
+    user_id = ''.join(c for c in user_id if c.isalnum() or c in ('_', '-'))
+
+    if make_dirs:
+        os.makedirs(args.output, exist_ok=True)  # Ensure the output directory exists
+    output_filename = os.path.join(args.output, f'sine_waves_{user_id}.txt')
+
+    try:
+        print(f"\nSaving to {output_filename}...")
+        start = time.monotonic()
+        source = SignalBlocks(args.channels, args.fs, args.seed)
+        rows = write_recording(output_filename, source, args.duration * 60)
+        print(f"\nSine waves saved successfully to {output_filename} ({rows} rows in {time.monotonic() - start:.1f}s)")
+    except Exception as e:
+        print(f"\nAn error occurred while saving the file: {e}")
+
+if __name__ == "__main__":
+    main()